@@ -0,0 +1,31 @@
+"""
+Binning of spray and launch angles, shared by the stats tables and the plots without either needing the other.
+"""
+
+import numpy as np
+
+SPRAY_BINS = 16
+LAUNCH_BINS = 12
+
+
+def angle_counts(angles, bins, groups=None, n_groups=None):
+    """
+    Histogram angles into equal-width bins partitioning [-pi, pi), like circular_hist with gaps=False,
+    for any number of groups (eg. batters) in one pass.
+    :param angles: array of angles (in degrees). NaNs are not counted
+    :param bins: number of bins
+    :param groups: int array of each angle's group (eg. from pd.factorize), negative to skip it.
+        None to count every angle as one group
+    :param n_groups: number of groups. defaults to groups.max() + 1
+    :return: (n_groups, bins) int array of counts, or (bins,) if groups is None
+    """
+    x = np.deg2rad(np.asarray(angles, dtype=float))
+    x = (x + np.pi) % (2 * np.pi) - np.pi  # wrap to [-pi, pi)
+    codes = np.zeros(x.size, dtype=np.int64) if groups is None else np.asarray(groups, dtype=np.int64)
+    if n_groups is None:
+        n_groups = 1 if groups is None else int(codes.max(initial=-1)) + 1
+
+    keep = ~np.isnan(x) & (codes >= 0)
+    bin_index = np.minimum(((x[keep] + np.pi) * (bins / (2 * np.pi))).astype(np.int64), bins - 1)
+    counts = np.bincount(codes[keep] * bins + bin_index, minlength=n_groups * bins).reshape(n_groups, bins)
+    return counts[0] if groups is None else counts
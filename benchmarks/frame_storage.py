@@ -0,0 +1,76 @@
+"""
+Compare memory use and construction time of the columnar Track against the old lists of Frame dataclasses.
+
+Run from the repository root:
+    python -m benchmarks.frame_storage --pitches 200 --rate 300
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from util import Frame, PitchFrames
+
+
+def fake_samples(n_ball, n_bat, seed=0):
+    """ samples_ball and samples_bat lists in the shape of the raw WISD files """
+    rng = np.random.default_rng(seed)
+    ball_time = np.sort(rng.uniform(0, 2, n_ball))
+    bat_time = np.sort(rng.uniform(0, 2, n_bat))
+    samples_ball = [{"time": t, "pos": rng.normal(size=3).tolist()} for t in ball_time.tolist()]
+    samples_bat = [{"time": t, "event": "Hit" if i == n_bat // 2 else "",
+                    "head": {"pos": rng.normal(size=3).tolist()},
+                    "handle": {"pos": rng.normal(size=3).tolist()}}
+                   for i, t in enumerate(bat_time.tolist())]
+    return samples_ball, samples_bat
+
+
+def legacy_from_dict(samples_ball, samples_bat):
+    """ PitchFrames.from_dict as it was before Tracks: one Frame per sample, velocity in a python loop """
+    ball = [Frame(s["time"], *s["pos"]) for s in samples_ball]
+    head = [Frame(s["time"], *(s["head"]["pos"])) for s in samples_bat]
+    handle = [Frame(s["time"], *(s["handle"]["pos"])) for s in samples_bat]
+    for frames in (head, handle):
+        for start, mid, end in zip(frames[:-4], frames[2:-2], frames[4:]):
+            delta_time = end.time - start.time
+            mid.vx = (end.x - start.x) / delta_time
+            mid.vy = (end.y - start.y) / delta_time
+            mid.vz = (end.z - start.z) / delta_time
+            mid.speed = np.sqrt(mid.vx ** 2 + mid.vy ** 2 + mid.vz ** 2)
+    return ball, head, handle
+
+
+def measure(build, samples):
+    """ :return: (seconds, bytes still allocated by the built objects) """
+    tracemalloc.start()
+    start = time.perf_counter()
+    built = [build(*s) for s in samples]
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+    return elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pitches", type=int, default=200)
+    parser.add_argument("--rate", type=int, default=300, help="samples per second of tracking")
+    args = parser.parse_args()
+
+    n_samples = 2 * args.rate  # each fake pitch covers 2 seconds
+    samples = [fake_samples(n_samples, n_samples, seed=i) for i in range(args.pitches)]
+
+    results = {
+        "Frame lists": measure(legacy_from_dict, samples),
+        "Tracks": measure(PitchFrames.from_dict, samples),
+    }
+    print(f"{args.pitches} pitches, {3 * n_samples} samples each")
+    for name, (elapsed, size) in results.items():
+        print(f"{name:>12}: {elapsed:7.3f} s  {size / 2**20:8.2f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Benchmarks of the hot paths, on synthetic data (see benchmarks/synthetic.py), compared against a stored baseline.
+
+Each case is timed (best of a few repeats) and its peak memory is measured with tracemalloc in a separate run, since
+tracing slows the code down. Results are compared with benchmarks/baseline.json, and cases which got slower or
+bigger by more than the tolerance are reported, with a non-zero exit status.
+
+Run from the repository root:
+    python -m benchmarks.suite                       # compare with the baseline
+    python -m benchmarks.suite --pitches 5000        # 10x the default scale
+    python -m benchmarks.suite --save-baseline       # record a new baseline
+    python -m benchmarks.suite --only contact kinematics
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import contact
+import data
+import ingest
+import kinematics
+import metrics
+import swing_search
+import util
+import xxba
+from benchmarks import synthetic
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+MIN_DIFFERENCE = 0.005  # seconds. smaller slowdowns are treated as noise, whatever the ratio
+
+
+def synthetic_xxba():
+    """ GridModel with a made up (but xBA shaped) surface, for when no trained model is available """
+    ev = np.arange(0., 125.5, 0.5)
+    la = np.arange(-90., 90.5, 0.5)
+    ev_mesh, la_mesh = np.meshgrid(ev, la, indexing="ij")
+    values = 1 / (1 + np.exp(-(ev_mesh - 95) / 8)) * np.exp(-((la_mesh - 15) / 25) ** 2)
+    return xxba.GridModel(ev, la, values)
+
+
+def prepare(args, work_dir):
+    """ generate the synthetic data and everything the cases start from """
+    raw_dir = os.path.join(work_dir, "raw")
+    paths = synthetic.write_files(raw_dir, args.pitches, args.ball_rate, args.bat_rate, args.hit_fraction,
+                                  args.no_bat_fraction, seed=args.seed)
+    dats = []
+    for path in paths:
+        with open(path) as f:
+            dats.append(json.load(f))
+    pitches = [util.PitchFrames.from_dict(d["samples_ball"], d["samples_bat"]) for d in dats]
+    swings = [p for p in pitches if p.has_bat() and p.hit_time is not None]
+
+    xxba_path = os.path.join(work_dir, "xxba_grid.npz")
+    synthetic_xxba().save(xxba_path)
+    rng = np.random.default_rng(args.seed)
+    exit_launch = np.column_stack([rng.uniform(20, 120, args.xxba_rows), rng.normal(12, 25, args.xxba_rows)])
+
+    ctx = {
+        "args": args, "work_dir": work_dir, "raw_dir": raw_dir, "dats": dats, "pitches": pitches, "swings": swings,
+        "xxba_path": xxba_path, "exit_launch": exit_launch,
+    }
+    # tables for the page cases
+    ctx["tables"] = ingest_paths(work_dir, "tables")
+    ingest.run(raw_dir, xxba_path=xxba_path, workers=args.workers, **ctx["tables"])
+    return ctx
+
+
+def ingest_paths(work_dir, name):
+    """ :return: output paths of an ingest.run into work_dir/name """
+    out = os.path.join(work_dir, name)
+    os.makedirs(out, exist_ok=True)
+    return {
+        "events_path": os.path.join(out, "events.csv"),
+        "stats_path": os.path.join(out, "stats.csv"),
+        "league_path": os.path.join(out, "league.csv"),
+        "manifest_path": os.path.join(out, "manifest.json"),
+        "names_path": os.path.join(out, "names.json"),
+    }
+
+
+# region cases
+# each case takes the prepared context and returns the function to measure
+
+def bench_ingest(ctx):
+    paths = ingest_paths(ctx["work_dir"], "ingest")
+    return lambda: ingest.run(ctx["raw_dir"], xxba_path=ctx["xxba_path"], workers=ctx["args"].workers, **paths)
+
+
+def bench_from_dict(ctx):
+    return lambda: [util.PitchFrames.from_dict(d["samples_ball"], d["samples_bat"]) for d in ctx["dats"]]
+
+
+def bench_kinematics(ctx):
+    # the bat velocity PitchFrames.from_dict computes, for every pitch at once
+    tracks = [track for p in ctx["swings"] for track in (p.head, p.handle)]
+    return lambda: kinematics.track_kinematics(tracks, acceleration=False, method="centred", half_window=2,
+                                               edge="nan")
+
+
+def bench_contact(ctx):
+    return lambda: contact.pitches_contact(ctx["swings"])
+
+
+def bench_time_of_contact(ctx):
+    return lambda: [util.time_of_contact(p.head, p.handle, p.ball) for p in ctx["swings"]]
+
+
+def bench_extract_coords(ctx):
+    return lambda: [util.extract_coords_from_frames(p.head, p.hit_time - 0.01, p.hit_time + 0.01)
+                    for p in ctx["swings"]]
+
+
+def bench_get_speed(ctx):
+    return lambda: [metrics.get_speed(getattr(p, body), p.hit_time) for p in ctx["swings"]
+                    for body in ("head", "handle")]
+
+
+def bench_bat_elevation(ctx):
+    return lambda: [metrics.bat_elevation_angle(p) for p in ctx["swings"]]
+
+
+def bench_swing_metrics(ctx):
+    # every metric of every pitch in one call, replacing get_speed/bat_elevation_angle per pitch
+    return lambda: metrics.pitches_swing_metrics(ctx["swings"])
+
+
+def bench_swing_search(ctx):
+    """ index every swing, and find the nearest swings of the first 100 """
+    pitches = dict(enumerate(ctx["swings"]))
+
+    def run():
+        index = swing_search.SwingIndex.build(pitches)
+        for fileID in index.file_ids[:100]:
+            index.similar(fileID)
+    return run
+
+
+def bench_xxba_predict(ctx):
+    model = xxba.load(ctx["xxba_path"])
+    return lambda: model.predict(ctx["exit_launch"])
+
+
+def bench_data_explorer(ctx):
+    """ cold load of the Data Explorer page's tables, and one round of its filters """
+    events_path = ctx["tables"]["events_path"]
+
+    def run():
+        data._load_events.clear()
+        data._filter_index.clear()
+        index = data.filter_index(events_path)
+        selection = index.equals("result", "HitIntoPlay") | index.equals("result", "Strike")
+        batters = index.value_counts("batter_name", selection)
+        selection &= index.isin("batter_name", batters.index[:5])
+        in_range = index.between("exit_velocity", 40, 110) & index.between("xxBA", 0, 1)
+        for name in batters.index[:5]:
+            index.rows(index.equals("batter_name", name) & selection & in_range)
+    return run
+
+
+def bench_player_profiles(ctx):
+    """ cold load of the Player Profiles page's tables, and one batter's rows and similar batters """
+    tables = ctx["tables"]
+
+    def run():
+        for cached in (data._load_events, data._load_stats, data._load_angle_counts, data._similarity_index):
+            cached.clear()
+        df = data.load_events(tables["events_path"])
+        gp = df.groupby(["batter_name"], observed=True)
+        data.load_stats(tables["stats_path"], tables["league_path"])
+        data.load_angle_counts(tables["stats_path"])
+        batter = gp.size().idxmax()
+        gp.get_group((batter,))
+        data.similarity_index(tables["events_path"]).similar(batter)
+    return run
+
+
+CASES = {
+    "ingest": bench_ingest,
+    "from_dict": bench_from_dict,
+    "kinematics": bench_kinematics,
+    "contact": bench_contact,
+    "time_of_contact": bench_time_of_contact,
+    "extract_coords": bench_extract_coords,
+    "get_speed": bench_get_speed,
+    "bat_elevation": bench_bat_elevation,
+    "swing_metrics": bench_swing_metrics,
+    "swing_search": bench_swing_search,
+    "xxba_predict": bench_xxba_predict,
+    "page_data_explorer": bench_data_explorer,
+    "page_player_profiles": bench_player_profiles,
+}
+# endregion cases
+
+
+def measure(fn, repeats=3):
+    """ :return: dict of the best wall time (s) over repeats, and peak traced memory (MiB) of one more run """
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": best, "peak_mib": peak / 2 ** 20}
+
+
+def compare(results, baseline, tolerance):
+    """
+    :param results: dict of case -> measure() result
+    :param baseline: the same, from an earlier run
+    :param tolerance: ratio to the baseline above which a case counts as a regression
+    :return: list of (case, metric, baseline value, new value) regressions
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        if result["seconds"] > old["seconds"] * tolerance and result["seconds"] - old["seconds"] > MIN_DIFFERENCE:
+            regressions.append((name, "seconds", old["seconds"], result["seconds"]))
+        if result["peak_mib"] > old["peak_mib"] * tolerance and result["peak_mib"] - old["peak_mib"] > 1:
+            regressions.append((name, "peak_mib", old["peak_mib"], result["peak_mib"]))
+    return regressions
+
+
+def config(args):
+    """ the settings which change what is measured, stored with the baseline """
+    return {key: getattr(args, key) for key in
+            ("pitches", "ball_rate", "bat_rate", "hit_fraction", "no_bat_fraction", "xxba_rows", "workers", "seed")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pitches", type=int, default=500)
+    parser.add_argument("--ball-rate", type=int, default=300, help="ball samples per second")
+    parser.add_argument("--bat-rate", type=int, default=300, help="bat samples per second")
+    parser.add_argument("--hit-fraction", type=float, default=0.6)
+    parser.add_argument("--no-bat-fraction", type=float, default=0.1)
+    parser.add_argument("--xxba-rows", type=int, default=1_000_000, help="rows scored in the xxba_predict case")
+    parser.add_argument("--workers", type=int, default=0, help="ingest processes. 0 parses in this process")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--only", nargs="+", choices=list(CASES), help="cases to run. defaults to all")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=1.3, help="ratio to the baseline counted as a regression")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        if stored["config"] != config(args):
+            print(f"warning: baseline was measured with {stored['config']}")
+        baseline = stored["results"]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        ctx = prepare(args, work_dir)
+        print(f"{args.pitches} pitches, {len(ctx['swings'])} with a swing and hit")
+        results = {}
+        for name in args.only or CASES:
+            results[name] = measure(CASES[name](ctx), args.repeats)
+            old = baseline.get(name)
+            versus = f"  ({results[name]['seconds'] / old['seconds']:5.2f}x baseline)" if old else ""
+            print(f"{name:>22}: {results[name]['seconds']:8.4f} s {results[name]['peak_mib']:9.2f} MiB{versus}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"config": config(args), "results": results}, f, indent=1)
+        print(f"saved baseline to {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    for name, metric, old, new in regressions:
+        print(f"regression: {name} {metric} {old:.4f} -> {new:.4f}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Generate synthetic raw WISD files, for benchmarking at any scale without the real (private) data.
+
+Each file has the fields ingest.py reads, in the same shape as the raw JSONL files: ball and bat samples, a Hit event
+with the batter and launch angles, and the pitch summary. Pitches can be made with or without a hit, and with or
+without bat tracking. Values are made up, but smooth enough for the kinematics and metrics to run as usual.
+
+Run from the repository root:
+    python -m benchmarks.synthetic /tmp/wisd --pitches 1000 --ball-rate 300 --bat-rate 300
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+BALL_DURATION = 1.2  # seconds of ball tracking per pitch
+BAT_DURATION = 0.6  # seconds of bat tracking per pitch
+
+
+def make_pitch(rng, ball_rate=300, bat_rate=300, hit=True, has_bat=True, batter_id=100):
+    """
+    :param rng: np.random.Generator
+    :param ball_rate: ball samples per second
+    :param bat_rate: bat samples per second
+    :param hit: whether the pitch has a Hit event
+    :param has_bat: whether the pitch has bat tracking
+    :param batter_id: batter's mlbId
+    :return: dict in the shape of a raw WISD file
+    """
+    bat_time = np.round(np.arange(0, BAT_DURATION, 1 / bat_rate), 6)
+    hit_index = int(bat_time.size * rng.uniform(0.4, 0.6))
+    hit_time = float(bat_time[hit_index])
+
+    # handle drifts forward while the bat rotates around it
+    angle = (bat_time - hit_time) * rng.uniform(15, 25) + rng.normal(0, 0.2)
+    handle = np.stack([0.3 * bat_time ** 2, 0.1 * bat_time - 1, np.full(bat_time.size, 3.)], axis=1)
+    tilt = rng.uniform(-0.3, 0.3)
+    head = handle + 2.8 * np.stack([np.cos(angle), np.sin(angle), np.full(bat_time.size, tilt)], axis=1)
+    head += rng.normal(0, 0.005, head.shape)  # tracking noise
+    handle += rng.normal(0, 0.005, handle.shape)
+
+    ball_time = np.round(np.arange(0, BALL_DURATION, 1 / ball_rate), 6)
+    ball = np.stack([1.5 + 0 * ball_time, (ball_time - hit_time) * -130, 3 + 0.5 * (ball_time - hit_time)], axis=1)
+
+    samples_bat = [
+        {"time": t, "event": "Hit" if hit and i == hit_index else ("" if has_bat else "No"),
+         "head": {"pos": h}, "handle": {"pos": hd}}
+        for i, (t, h, hd) in enumerate(zip(bat_time.tolist(), head.tolist(), handle.tolist()))
+    ]
+    events = [{"type": "Pitch", "time": 0.}]
+    if hit:
+        events.insert(0, {"type": "Hit", "time": hit_time, "personId": {"mlbId": batter_id},
+                          "start": {"angle": [rng.normal(0, 25), rng.normal(12, 25)]}})
+    return {
+        "samples_ball": [{"time": t, "pos": p} for t, p in zip(ball_time.tolist(), ball.tolist())],
+        "samples_bat": samples_bat,
+        "events": events,
+        "summary_acts": {
+            "pitch": {"result": "HitIntoPlay" if rng.uniform() < 0.5 else "Strike", "action": {}},
+            "hit": {"speed": {"mph": rng.uniform(40, 115)}},
+        },
+    }
+
+
+def write_files(out_dir, pitches=500, ball_rate=300, bat_rate=300, hit_fraction=0.6, no_bat_fraction=0.1,
+                batters=30, seed=0):
+    """
+    Write synthetic raw files to out_dir, one pitch per file, named like the raw files (<fileID>.jsonl).
+    :param hit_fraction: portion of pitches with a Hit event
+    :param no_bat_fraction: portion of pitches without bat tracking
+    :param batters: number of distinct batters
+    :return: list of paths written
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(pitches):
+        dat = make_pitch(rng, ball_rate, bat_rate,
+                         hit=rng.uniform() < hit_fraction,
+                         has_bat=rng.uniform() >= no_bat_fraction,
+                         batter_id=100 + int(rng.integers(batters)))
+        path = os.path.join(out_dir, f"{i:06d}.jsonl")
+        with open(path, "w") as f:
+            json.dump(dat, f)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out_dir")
+    parser.add_argument("--pitches", type=int, default=500)
+    parser.add_argument("--ball-rate", type=int, default=300, help="ball samples per second")
+    parser.add_argument("--bat-rate", type=int, default=300, help="bat samples per second")
+    parser.add_argument("--hit-fraction", type=float, default=0.6)
+    parser.add_argument("--no-bat-fraction", type=float, default=0.1)
+    parser.add_argument("--batters", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    paths = write_files(args.out_dir, args.pitches, args.ball_rate, args.bat_rate, args.hit_fraction,
+                        args.no_bat_fraction, args.batters, args.seed)
+    print(f"wrote {len(paths)} files to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
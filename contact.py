@@ -0,0 +1,134 @@
+"""
+Find the moment the bat and ball are closest, for one pitch or many at once.
+
+The bat is modelled as the segment from handle to head. For each ball sample, head and handle positions are
+linearly interpolated to the ball's time (bat and ball are not sampled at the same times), then the ball's distance
+to the segment is computed for every sample of every pitch in one vectorized pass. The closest sample is refined by
+fitting a parabola through the squared distances at it and its two neighbours, which gives a sub-frame estimate.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+import ragged
+
+Contact = namedtuple("Contact", ["time", "distance"])
+
+
+def segment_distance(point, seg_start, seg_end):
+    """
+    distance from points to line segments.
+    :param point: (3, N) points
+    :param seg_start: (3, N) start of each segment
+    :param seg_end: (3, N) end of each segment
+    :return: (N,) distances
+    """
+    seg = seg_end - seg_start
+    rel = point - seg_start
+    seg_sq = (seg * seg).sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # position of the closest point along the segment. degenerate (zero-length) segments use their start
+        s = np.where(seg_sq > 0, (rel * seg).sum(axis=0) / seg_sq, 0.)
+    s = np.clip(s, 0, 1)
+    return np.sqrt(((rel - s * seg) ** 2).sum(axis=0))
+
+
+def _parabola_vertex(t0, t1, t2, d0, d1, d2):
+    """ time of the minimum of the parabola through (t0, d0), (t1, d1), (t2, d2). t1 where it has no minimum """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        denom = (t0 - t1) * (t0 - t2) * (t1 - t2)
+        a = (t2 * (d1 - d0) + t1 * (d0 - d2) + t0 * (d2 - d1)) / denom
+        b = (t2 ** 2 * (d0 - d1) + t1 ** 2 * (d2 - d0) + t0 ** 2 * (d1 - d2)) / denom
+        vertex = -b / (2 * a)
+    ok = (a > 0) & np.isfinite(vertex)
+    return np.where(ok, np.clip(vertex, t0, t2), t1)
+
+
+def batch_contact(bat_time, head, handle, bat_offsets, ball_time, ball, ball_offsets):
+    """
+    Time of closest approach between bat and ball for a ragged batch of pitches.
+    :param bat_time: (N,) bat sample times, sorted within each pitch
+    :param head: (3, N) bat head positions
+    :param handle: (3, N) bat handle positions
+    :param bat_offsets: (P+1,) offsets of each pitch's bat samples
+    :param ball_time: (M,) ball sample times, sorted within each pitch
+    :param ball: (3, M) ball positions
+    :param ball_offsets: (P+1,) offsets of each pitch's ball samples
+    :return: Contact(time (P,), distance (P,)). NaN for pitches where ball and bat tracking don't overlap in time
+    """
+    bat_time = np.asarray(bat_time, dtype=float)
+    ball_time = np.asarray(ball_time, dtype=float)
+    bat_offsets = np.asarray(bat_offsets, dtype=np.int64)
+    ball_offsets = np.asarray(ball_offsets, dtype=np.int64)
+    n_pitches = len(ball_offsets) - 1
+    if bat_time.size == 0 or ball_time.size == 0:
+        return Contact(np.full(n_pitches, np.nan), np.full(n_pitches, np.nan))
+
+    # bracket each ball sample between two bat samples of the same pitch
+    idx = ragged.searchsorted(bat_time, bat_offsets, ball_time, ball_offsets)
+    ids = ragged.segment_ids(ball_offsets)
+    start, stop = bat_offsets[:-1][ids], bat_offsets[1:][ids]
+    has_bat = stop > start
+    last = np.maximum(stop - 1, start)
+    hi = np.clip(idx, start, last)
+    lo = np.clip(idx - 1, start, last)
+    hi[~has_bat] = lo[~has_bat] = 0
+
+    # interpolate the bat to the ball's sample times. ball samples outside the bat's time range are ignored
+    inside = has_bat & (ball_time >= bat_time[lo]) & (ball_time <= bat_time[hi])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        w = np.where(hi > lo, (ball_time - bat_time[lo]) / (bat_time[hi] - bat_time[lo]), 0.)
+    head_at = head[:, lo] + w * (head[:, hi] - head[:, lo])
+    handle_at = handle[:, lo] + w * (handle[:, hi] - handle[:, lo])
+    dist = np.where(inside, segment_distance(ball, handle_at, head_at), np.nan)
+
+    # closest sample of each pitch, refined between its neighbours
+    best = ragged.argmin(dist, ball_offsets)
+    found = best >= 0
+    i = best[found]
+    prev = np.maximum(i - 1, ball_offsets[:-1][found])
+    nxt = np.minimum(i + 1, ball_offsets[1:][found] - 1)
+    usable = (prev < i) & (nxt > i) & ~np.isnan(dist[prev]) & ~np.isnan(dist[nxt])
+
+    t_best = ball_time[i].copy()
+    d_sq = dist ** 2
+    t_best[usable] = _parabola_vertex(ball_time[prev[usable]], ball_time[i[usable]], ball_time[nxt[usable]],
+                                      d_sq[prev[usable]], d_sq[i[usable]], d_sq[nxt[usable]])
+
+    # distance at the refined time, with ball and bat interpolated between the samples either side of it
+    d_best = dist[i].copy()
+    refined = usable & (t_best != ball_time[i])
+    if refined.any():
+        j = np.where(t_best[refined] < ball_time[i[refined]], prev[refined], nxt[refined])
+        k = i[refined]
+        frac = (t_best[refined] - ball_time[k]) / (ball_time[j] - ball_time[k])
+        ball_r = ball[:, k] + frac * (ball[:, j] - ball[:, k])
+        head_r = head_at[:, k] + frac * (head_at[:, j] - head_at[:, k])
+        handle_r = handle_at[:, k] + frac * (handle_at[:, j] - handle_at[:, k])
+        d_best[refined] = segment_distance(ball_r, handle_r, head_r)
+
+    time = np.full(n_pitches, np.nan)
+    distance = np.full(n_pitches, np.nan)
+    time[found] = t_best
+    distance[found] = d_best
+    return Contact(time, distance)
+
+
+def pitches_contact(pitches):
+    """
+    Time of closest approach between bat and ball for many pitches.
+    :param pitches: list of util.PitchFrames
+    :return: Contact(time (P,), distance (P,)). NaN for pitches without bat tracking
+    """
+    if not pitches:
+        return Contact(np.empty(0), np.empty(0))
+    empty_time, empty_pos = np.empty(0), np.empty((3, 0))
+    heads = [p.head if p.has_bat() else None for p in pitches]
+    handles = [p.handle if p.has_bat() else None for p in pitches]
+    bat_time, bat_offsets = ragged.concat([empty_time if h is None else h.time for h in heads])
+    head, _ = ragged.concat([empty_pos if h is None else h.positions for h in heads])
+    handle, _ = ragged.concat([empty_pos if h is None else h.positions for h in handles])
+    ball_time, ball_offsets = ragged.concat([p.ball.time for p in pitches])
+    ball, _ = ragged.concat([p.ball.positions for p in pitches])
+    return batch_contact(bat_time, head, handle, bat_offsets, ball_time, ball, ball_offsets)
@@ -0,0 +1,114 @@
+"""
+Shared data access for the Streamlit pages.
+
+Tables are read once per process and shared by every session (st.cache_resource), instead of being re-read by each
+page on every rerun. Each cache is keyed on the file's modification time, so rewriting a file (eg. by ingest.py)
+is picked up on the next rerun. Cached tables are shared: pages must not modify them in place.
+"""
+
+import os
+
+import pandas as pd
+import streamlit as st
+
+import instrument
+import stats
+from figcache import FigureCache
+from filters import FilterIndex
+from similarity import SimilarityIndex, batter_profiles
+from stats import STATS_PATH, LEAGUE_PATH
+
+EVENTS_PATH = "data/WISD events.csv"
+
+METRIC_COLUMNS = [
+    "spray_angle", "launch_angle", "exit_velocity", "bat_elevation", "bat_forward_tilt",
+    "head_speed", "head_speed_x", "head_speed_y", "head_speed_z",
+    "handle_speed", "handle_speed_x", "handle_speed_y", "handle_speed_z", "xxBA"
+]
+EVENT_DTYPES = {
+    "fileID": str,
+    "result": "category",
+    "action": "category",
+    "batter_name": "category",
+    **{col: "float32" for col in METRIC_COLUMNS}
+}
+
+
+def data_version(path):
+    """ identifies the current contents of a file, for cache keys """
+    return os.stat(path).st_mtime_ns
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _load_events(path, version):
+    with instrument.stage("read_events"):
+        df = pd.read_csv(path, dtype=EVENT_DTYPES)
+    if "parse_error" in df:
+        df = df[df.parse_error.isna()]  # only retain rows without parse errors
+        df = df.drop("parse_error", axis=1)  # remove parse_error column
+    return df
+
+
+def load_events(path=EVENTS_PATH):
+    """ :return: events table, without rows which failed to parse """
+    return _load_events(path, data_version(path))
+
+
+def events_version(path=EVENTS_PATH):
+    """ version of the events table, for keying anything derived from it (eg. cached figures) """
+    return data_version(path)
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _filter_index(path, version):
+    df = _load_events(path, version)
+    with instrument.stage("build_filter_index"):
+        return FilterIndex(df[df.has_bat & df.has_hit].reset_index(drop=True))
+
+
+def filter_index(path=EVENTS_PATH):
+    """ :return: FilterIndex over the events with a bat and a hit (the rows Data Explorer plots). see filters.py """
+    return _filter_index(path, data_version(path))
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _similarity_index(path, version):
+    df = _load_events(path, version)
+    with instrument.stage("build_similarity_index"):
+        return SimilarityIndex(batter_profiles(df))
+
+
+def similarity_index(path=EVENTS_PATH):
+    """ :return: SimilarityIndex over the profiles of every batter in the events table. see similarity.py """
+    return _similarity_index(path, data_version(path))
+
+
+@st.cache_resource(show_spinner=False)
+def figure_cache():
+    """ :return: FigureCache shared by every session """
+    return FigureCache()
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _load_stats(path, league_path, version):
+    with instrument.stage("read_stats"):
+        return stats.load(path, league_path)
+
+
+def load_stats(path=STATS_PATH, league_path=LEAGUE_PATH):
+    """
+    Ranks and league averages are stored with the stats by stats.save, so they are only looked up here.
+    :return: (per-batter stats, per-batter ranks of each stat, league average of each stat)
+    """
+    version = (data_version(path), data_version(league_path) if os.path.exists(league_path) else None)
+    return _load_stats(path, league_path, version)
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _load_angle_counts(path, version):
+    return stats.load_angle_counts(path)
+
+
+def load_angle_counts(path=STATS_PATH):
+    """ :return: dict of "spray_angle"/"launch_angle" -> per-batter histogram counts. see stats.angle_counts """
+    return _load_angle_counts(path, data_version(path))
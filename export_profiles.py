@@ -0,0 +1,234 @@
+"""
+Export every batter's profile to static HTML and PNG files, without running the dashboard.
+
+Each batter gets a page like Player Profiles: the stats table, launch and spray angle histograms next to the league's,
+and the exit velocity exceedance curve, drawn with the same plots functions. Figures are rendered over a process
+pool. The league's histograms are only rendered once, and shared by every batter's page.
+
+Figures are only re-rendered when the data they are drawn from changed since the last export, as recorded by a hash
+of each batter's inputs in the output directory (export manifest.json). The HTML pages are rewritten every time,
+since ranks and league averages can change with any batter's data.
+
+Usage:
+    python export_profiles.py private/profiles --workers 4
+"""
+
+import argparse
+import hashlib
+import html
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+matplotlib.use("Agg")  # plots only draws on Figure objects, but make sure nothing ever opens a window
+
+import numpy as np
+import pandas as pd
+
+import data
+import instrument
+import manifest
+import plots
+import stats
+from figcache import to_png
+
+OUT_DIR = "private/profiles"
+MANIFEST_NAME = "export manifest.json"
+LEAGUE_DIR = "league"
+FIGURES = ["launch", "spray", "exit_velocity"]
+FORMAT_VERSION = 1  # part of every hash. increase it when the figures are drawn differently, to re-render them all
+
+_PAGE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>{title}</title></head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+_league_velocity = None  # exit velocities of every batted ball, set in each worker by _init_worker
+
+
+def _init_worker(league_velocity):
+    global _league_velocity
+    _league_velocity = league_velocity
+
+
+def _digest(*values):
+    """ :return: sha1 hex digest of strings and arrays """
+    digest = hashlib.sha1(str(FORMAT_VERSION).encode())
+    for value in values:
+        digest.update(value.encode() if isinstance(value, str) else np.ascontiguousarray(value).tobytes())
+    return digest.hexdigest()
+
+
+def _name_hash(batter):
+    return hashlib.sha1(batter.encode()).hexdigest()[:8]
+
+
+def batter_dir(batter):
+    """
+    :return: name of the directory a batter's profile is exported to, if no other batter's has the same name.
+        names without any letters or digits get a hash of the name instead
+    """
+    return re.sub(r"[^\w-]+", "_", batter).strip("_") or _name_hash(batter)
+
+
+def batter_dirs(batters):
+    """
+    Directories of several batters' profiles. Names that map to the same directory (ignoring case, for
+    case-insensitive file systems), or to the league's, get a short hash of the batter's name appended.
+    :param batters: iterable of batter names
+    :return: dict of batter name: directory name
+    """
+    dirs = {batter: batter_dir(batter) for batter in batters}
+    taken = pd.Series([LEAGUE_DIR] + list(dirs.values())).str.lower()
+    clashes = set(taken[taken.duplicated(keep=False)])
+    return {batter: f"{name}_{_name_hash(batter)}" if name.lower() in clashes else name
+            for batter, name in dirs.items()}
+
+
+def render_batter(job):
+    """
+    Render some of a batter's figures to PNG files. Runs in a worker process.
+    :param job: (batter, output directory, names of the FIGURES to render, exit velocities, launch angle counts,
+        spray angle counts)
+    :return: batter
+    """
+    batter, out_dir, names, velocity, launch, spray = job
+    renderers = {
+        "launch": lambda: plots.launch_figure(launch, batter),
+        "spray": lambda: plots.spray_figure(spray, batter),
+        "exit_velocity": lambda: plots.exit_velocity_figure(velocity, _league_velocity, batter),
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    for name in names:
+        with open(os.path.join(out_dir, f"{name}.png"), "wb") as f:
+            f.write(to_png(renderers[name]()))
+    return batter
+
+
+def _render_all(jobs, workers, league_velocity):
+    if workers == 0:
+        _init_worker(league_velocity)
+        yield from map(render_batter, jobs)
+        return
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(league_velocity,)) as pool:
+        yield from pool.map(render_batter, jobs)
+
+
+def batter_page(batter, table):
+    """ :return: HTML of a batter's profile. figures are linked from the batter's and the league's directories """
+    league = f"../{LEAGUE_DIR}"
+    body = f"""<p><a href="../index.html">All batters</a></p>
+<h1>{html.escape(batter)}</h1>
+{table.to_html()}
+<h2>Launch Angle</h2>
+<img src="launch.png" width="45%"> <img src="{league}/launch.png" width="45%">
+<h2>Spray Angle</h2>
+<img src="spray.png" width="45%"> <img src="{league}/spray.png" width="45%">
+<h2>Exit Velocity</h2>
+<img src="exit_velocity.png" width="60%">"""
+    return _PAGE.format(title=html.escape(batter), body=body)
+
+
+def index_page(hits, dirs):
+    """
+    :param hits: Series of the number of events of each batter, most first
+    :param dirs: dict of batter name: directory name, from batter_dirs
+    """
+    items = "\n".join(f'<li><a href="{dirs[batter]}/index.html">{html.escape(batter)}</a> ({n})</li>'
+                      for batter, n in hits.items())
+    return _PAGE.format(title="Player Profiles", body=f"<h1>Player Profiles</h1>\n<ul>\n{items}\n</ul>")
+
+
+def _write(text, path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+@instrument.profiled("export_profiles")
+def export(out_dir=OUT_DIR, events_path=data.EVENTS_PATH, stats_path=stats.STATS_PATH,
+           league_path=stats.LEAGUE_PATH, workers=None, force=False):
+    """
+    Export the profile of every batter in the events table to out_dir.
+    :param workers: number of processes. None uses every CPU, 0 renders in this process
+    :param force: re-render every figure, even if its data hasn't changed
+    :return: (number of batters exported, number of them whose figures were rendered)
+    """
+    events = pd.read_csv(events_path, dtype=data.EVENT_DTYPES)
+    if "parse_error" in events:
+        events = events[events.parse_error.isna()]
+    batter_stats, ranks, avgs = stats.load(stats_path, league_path)
+    counts = stats.load_angle_counts(stats_path)
+    launch_counts, spray_counts = counts["launch_angle"], counts["spray_angle"]
+    league_velocity = events.exit_velocity.dropna().to_numpy()
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    previous = {} if force else manifest.load_manifest(manifest_path)
+    current = {"league": {}, "batters": {}}  # input hashes of the league's figures, and of each batter's
+
+    # league figures, shared by every batter
+    league_out = os.path.join(out_dir, LEAGUE_DIR)
+    current["league"]["angles"] = _digest(launch_counts.sum().to_numpy(), spray_counts.sum().to_numpy())
+    stale = previous.get("league", {}).get("angles") != current["league"]["angles"]
+    names = [name for name in ("launch", "spray")
+             if stale or not os.path.exists(os.path.join(league_out, f"{name}.png"))]
+    if names:
+        _init_worker(league_velocity)
+        render_batter(("League Overall", league_out, names, None, launch_counts.sum(), spray_counts.sum()))
+    league_digest = _digest(league_velocity)
+
+    # batters' figures. the exit velocity curve is drawn against the league's, so it also depends on the league
+    jobs = []
+    grouped = events.groupby("batter_name", observed=True)
+    dirs = batter_dirs(grouped.groups)
+    for batter, group in grouped:
+        velocity = group.exit_velocity.to_numpy()
+        launch, spray = launch_counts.loc[batter], spray_counts.loc[batter]
+        record = {"batter": _digest(batter, velocity, launch.to_numpy(), spray.to_numpy()), "league": league_digest}
+        current["batters"][batter] = record
+        old = previous.get("batters", {}).get(batter, {})
+        batter_out = os.path.join(out_dir, dirs[batter])
+        names = [name for name in FIGURES
+                 if old.get("batter") != record["batter"]
+                 or (name == "exit_velocity" and old.get("league") != record["league"])
+                 or not os.path.exists(os.path.join(batter_out, f"{name}.png"))]
+        if names:
+            jobs.append((batter, batter_out, names, velocity, launch, spray))
+
+    with instrument.stage("render"):
+        for _ in _render_all(jobs, workers, league_velocity):
+            instrument.count("batters_rendered")
+
+    # pages
+    for batter in current["batters"]:
+        table = stats.batter_table(batter, batter_stats, ranks, avgs)
+        _write(batter_page(batter, table), os.path.join(out_dir, dirs[batter], "index.html"))
+    _write(index_page(grouped.size().sort_values(ascending=False), dirs), os.path.join(out_dir, "index.html"))
+
+    manifest.save_manifest(current, manifest_path)
+    return len(current["batters"]), len(jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out_dir", nargs="?", default=OUT_DIR, help="directory to export to")
+    parser.add_argument("--events", default=data.EVENTS_PATH, help="events table, as written by ingest.py")
+    parser.add_argument("--stats", default=stats.STATS_PATH, help="per-batter stats table")
+    parser.add_argument("--league", default=stats.LEAGUE_PATH, help="league averages of the stats")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all CPUs, 0: none)")
+    parser.add_argument("--force", action="store_true", help="re-render every figure, even if its data is unchanged")
+    args = parser.parse_args()
+
+    n_batters, n_rendered = export(args.out_dir, args.events, args.stats, args.league, args.workers, args.force)
+    print(f"exported {n_batters} batters to {args.out_dir}, "
+          f"{n_rendered} with new figures ({n_batters - n_rendered} unchanged)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Cache of rendered matplotlib figures, stored as PNG bytes.
+
+Rendering dominates page time, and many figures (eg. league-wide plots) are the same for every batter and every
+session. Entries are evicted least-recently-used first, once the total size of cached images passes a cap.
+Keys should include everything the figure depends on, including the version of the data it was drawn from.
+"""
+
+import io
+import threading
+from collections import OrderedDict
+
+import instrument
+
+
+def to_png(fig, dpi=200):
+    """ render a figure to PNG bytes, with the same defaults as st.pyplot """
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight")
+    return buffer.getvalue()
+
+
+class FigureCache:
+    """ thread-safe LRU cache of PNG bytes, capped by total size """
+
+    def __init__(self, max_bytes=64 * 2**20):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, render):
+        """
+        :param key: hashable description of the figure (plot type, batter, filter settings, data version...)
+        :param render: called with no arguments on a cache miss. returns a matplotlib Figure
+        :return: PNG bytes of the figure
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                instrument.count("figure_cache_hits")
+                return self._entries[key]
+
+        # render outside the lock, so slow figures don't hold up other sessions
+        instrument.count("figure_cache_misses")
+        with instrument.stage("render"):
+            png = to_png(render())
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = png
+                self.size += len(png)
+            self._evict()
+        return png
+
+    def _evict(self):
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            _, png = self._entries.popitem(last=False)
+            self.size -= len(png)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
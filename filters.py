@@ -0,0 +1,110 @@
+"""
+Precomputed index over the events table, for composing Data Explorer filters without rescanning the table.
+
+Selections are bitmaps: packed arrays of one bit per row (np.packbits), combined with & | and invert(). The index
+holds
+- a bitmap for each value of each categorical column (eg. each batter, each result), for equality filters
+- each numeric column's values in sorted order, so a range filter is two binary searches
+Turning a bitmap into row indices (rows) is the only step which touches every row, and is done once per figure.
+"""
+
+import numpy as np
+import pandas as pd
+
+CATEGORICAL_COLUMNS = ["batter_name", "result"]
+
+
+class FilterIndex:
+    """ bitmap and sorted-order indexes over the rows of a DataFrame """
+
+    def __init__(self, df, categorical=CATEGORICAL_COLUMNS, numeric=None):
+        """
+        :param df: DataFrame to index. kept as .frame, and must not be modified afterwards
+        :param categorical: columns to build per-value bitmaps for
+        :param numeric: columns to build sorted orderings for. defaults to every float column
+        """
+        self.frame = df
+        self.n = len(df)
+        self._all = np.packbits(np.ones(self.n, dtype=bool))
+        if numeric is None:
+            numeric = [col for col in df if pd.api.types.is_float_dtype(df[col])]
+
+        self._codes = {}  # column -> (code of each row, values)
+        self._bitmaps = {}  # column -> bitmap of each value, as rows of a 2D array
+        for col in categorical:
+            codes, values = pd.factorize(df[col], sort=True)
+            rows = np.flatnonzero(codes >= 0)
+            bitmaps = np.zeros((len(values), self._all.size), dtype=np.uint8)
+            # set each row's bit in the bitmap of its value. same bit order as np.packbits
+            np.bitwise_or.at(bitmaps, (codes[rows], rows >> 3), (0x80 >> (rows & 7)).astype(np.uint8))
+            self._codes[col] = (codes, pd.Index(values))
+            self._bitmaps[col] = bitmaps
+
+        self._order = {}  # column -> (row order which sorts the column, sorted values). NaNs sort last
+        for col in numeric:
+            values = df[col].to_numpy(dtype=float)
+            order = np.argsort(values, kind="stable")
+            self._order[col] = (order, values[order])
+
+    def all(self):
+        """ :return: bitmap selecting every row """
+        return self._all.copy()
+
+    def none(self):
+        """ :return: bitmap selecting no rows """
+        return np.zeros_like(self._all)
+
+    def invert(self, bitmap):
+        """ :return: bitmap of the rows not in bitmap. use this rather than ~, which would set the padding bits """
+        return ~bitmap & self._all
+
+    def from_rows(self, rows):
+        """ :return: bitmap selecting the given row indices """
+        mask = np.zeros(self.n, dtype=bool)
+        mask[rows] = True
+        return np.packbits(mask)
+
+    def equals(self, col, value):
+        """ :return: bitmap of rows where col == value """
+        codes, values = self._codes[col]
+        i = values.get_indexer([value])[0]
+        return self.none() if i < 0 else self._bitmaps[col][i].copy()
+
+    def isin(self, col, values):
+        """ :return: bitmap of rows where col is any of values """
+        i = self._codes[col][1].get_indexer(list(values))
+        i = i[i >= 0]
+        return np.bitwise_or.reduce(self._bitmaps[col][i], axis=0) if i.size else self.none()
+
+    def between(self, col, lo, hi, inclusive=False):
+        """
+        :param inclusive: include rows equal to lo or hi. by default the range is open, like (col > lo) & (col < hi)
+        :return: bitmap of rows where col is between lo and hi. rows where col is NaN are never included
+        """
+        order, values = self._order[col]
+        start = np.searchsorted(values, lo, side="left" if inclusive else "right")
+        stop = np.searchsorted(values, hi, side="right" if inclusive else "left")
+        return self.from_rows(order[start:max(start, stop)])
+
+    def mask(self, bitmap):
+        """ :return: boolean array, one element per row """
+        return np.unpackbits(bitmap, count=self.n).view(bool)
+
+    def rows(self, bitmap):
+        """ :return: sorted row indices selected by bitmap, for indexing arrays or .iloc """
+        return np.flatnonzero(self.mask(bitmap))
+
+    def count(self, bitmap):
+        """ :return: number of rows selected by bitmap """
+        return int(np.count_nonzero(np.unpackbits(bitmap)))
+
+    def value_counts(self, col, bitmap):
+        """ :return: Series of the number of selected rows with each value of col, most common first. omits zeros """
+        codes, values = self._codes[col]
+        codes = codes[self.rows(bitmap)]
+        counts = pd.Series(np.bincount(codes[codes >= 0], minlength=len(values)), index=values, name="count")
+        return counts[counts > 0].sort_values(ascending=False, kind="stable")
+
+    def values(self, col, bitmap):
+        """ :return: Series of col for the selected rows """
+        return self.frame[col].iloc[self.rows(bitmap)]
@@ -0,0 +1,366 @@
+"""
+Parse the raw WISD JSONL files into the events and stats tables used by the dashboard.
+
+Files are parsed in parallel over a process pool and rows are written to the events CSV in batches, so memory use
+doesn't grow with the number of files. Files which fail to parse still get a row, with the error in parse_error.
+
+Usage:
+    python ingest.py "private/raw wisd data/" --events "data/WISD events.csv" --stats "data/WISD stats.csv"
+"""
+
+import argparse
+import os
+import warnings
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+import instrument
+import manifest
+import metrics
+import rawjson
+import stats
+import tracking_store
+import util
+import xxba
+
+RAW_DIR = "private/raw wisd data/"
+EVENTS_PATH = "data/WISD events.csv"
+STATS_PATH = stats.STATS_PATH
+LEAGUE_PATH = stats.LEAGUE_PATH
+XXBA_PATHS = (xxba.GRID_PATH, xxba.PICKLE_PATH)  # the grid model is preferred, since it is much faster
+
+# column order of the events table
+EVENT_COLUMNS = [
+    "fileID", "result", "action", "has_hit", "has_bat", "batter_name", "spray_angle", "launch_angle",
+    "exit_velocity", "bat_elevation", "bat_forward_tilt", "head_speed", "head_speed_x", "head_speed_y",
+    "head_speed_z", "handle_speed", "handle_speed_x", "handle_speed_y", "handle_speed_z", "xxBA", "parse_error"
+]
+
+# batter IDs are replaced by these (made up) names, in the order the batters are first seen
+NAMES = [
+    "Alice Atkins",
+    "Bob Batterson",
+    "Clara Clapham",
+    "David Dunkins",
+    "Ernest Engels",
+    "Frankie Fisher",
+    "Gabby Galway",
+    "Harry Hitterson",
+    "Ivy Isles",
+    "James Jacobson",
+    "Kyle Kevins",
+    "Liam Lowes",
+    "Mia Martinez",
+    "Nolan Nash",
+    "Olivia Olsen",
+    "Peter Parker",
+    "Quinn Quest",
+    "Ryan Reeve",
+    "Stacey Statkin",
+    "Talyor Tomlinson",
+    "Umberto Umbridge",
+    "Vivian Valley",
+    "Will Watkins",
+    "Xavier Xi",
+    "Yuri Yi",
+    "Zoey Zoolander",
+    "Arthur Bills",
+    "Chris Dane",
+    "Evan French",
+    "Gus Howe",
+    "John Knowles",
+    "Larry Michaels",
+    "Nina Owens"
+]
+
+
+def name_lookup(known=None):
+    """
+    defaultdict which pulls the next un-used name when it encounters a new batter ID.
+    Falls back to numbered names once NAMES runs out.
+    :param known: dict of batter ID -> name assigned by previous runs (see manifest.load_names)
+    """
+    known = dict(known or {})
+    taken = set(known.values())
+    names_iter = (name for name in NAMES if name not in taken)
+    lookup = defaultdict(lambda: next(names_iter, None) or f"Batter {len(lookup) + 1}", known)
+    return lookup
+
+
+def parse_pitch(dat, keep_tracking=False):
+    """
+    Build the events row for a single pitch.
+    :param dat: rawjson.RawPitch, or dict of the contents of a raw JSONL file.
+        The tracking samples are only decoded for pitches with a hit, unless keep_tracking is set
+    :param keep_tracking: also decode the tracking of pitches without a hit
+    :return: (row dict, PitchFrames). row is None for pitches without a hit, and so are their PitchFrames unless
+        keep_tracking is set. Batter is identified by "batterID", not yet named
+    """
+    row_dict = {
+        "result": dat["summary_acts"]["pitch"]["result"],
+        "action": dat["summary_acts"]["pitch"]["action"],
+        "has_hit": bool(len([True for event in dat["events"] if "Hit" in event.values()])),
+    }
+    if row_dict["action"] == {}:  # "no action" is encoded in JSON as an empty dict, instead of None.
+        row_dict["action"] = None
+
+    if not row_dict["has_hit"]:  # only hits get a row, since the extra metrics need one
+        if not keep_tracking:
+            return None, None
+        with instrument.stage("frames"):
+            return None, util.PitchFrames.from_dict(dat["samples_ball"], dat["samples_bat"])
+
+    with instrument.stage("frames"):
+        pitch_frames = util.PitchFrames.from_dict(dat["samples_ball"], dat["samples_bat"])
+    row_dict["has_bat"] = pitch_frames.has_bat()
+    row_dict["batterID"] = dat["events"][0]["personId"]["mlbId"]
+    row_dict["spray_angle"], row_dict["launch_angle"] = dat["events"][0]["start"]["angle"]
+    row_dict["exit_velocity"] = dat["summary_acts"]["hit"]["speed"]["mph"]
+
+    # bat properties at contact
+    try:
+        with instrument.stage("metrics"):
+            row_dict.update(metrics.swing_metrics(pitch_frames))
+    except Exception as e:
+        row_dict["parse_error"] = repr(e)  # store errors in df for inspection
+    return row_dict, pitch_frames
+
+
+def parse_file(path, keep_tracking=False):
+    """
+    Parse one raw JSONL file. Runs in a worker process.
+    :param keep_tracking: whether to return the pitch's tracking data, for pitches with or without a hit
+    :return: (fileID, row dict with fileID, PitchFrames or None). row is None for pitches without a hit
+    """
+    fileID = manifest.file_id(path)
+    instrument.count("files_parsed")
+    try:
+        with instrument.stage("read_json"):
+            dat = rawjson.RawPitch.open(path)
+        row_dict, pitch_frames = parse_pitch(dat, keep_tracking)
+    except Exception as e:
+        instrument.count("parse_errors")
+        return fileID, {"fileID": fileID, "parse_error": repr(e)}, None
+    if row_dict is not None:
+        row_dict["fileID"] = fileID
+    return fileID, row_dict, pitch_frames if keep_tracking else None
+
+
+def load_xxba(path=None):
+    """
+    :param path: grid (.npz) or pickled xxBA model. None picks the first of XXBA_PATHS which exists
+    :return: the xxBA model, or None if there isn't one
+    """
+    if path is None:
+        path = next((p for p in XXBA_PATHS if os.path.exists(p)), XXBA_PATHS[0])
+    if not os.path.exists(path):
+        warnings.warn(f"no xxBA model at {path}, xxBA will be left empty")
+        return None
+    return xxba.load(path)
+
+
+def finish_rows(rows, names, xxba_model):
+    """
+    Turn parsed rows into an events DataFrame: name batters, score xxBA and fix the column order.
+    :param rows: list of row dicts from parse_file
+    :param names: batterID -> name lookup (see name_lookup)
+    :param xxba_model: xxBA model with a .predict method, or None
+    """
+    df = pd.DataFrame.from_records(rows)
+    df["batter_name"] = [names[row["batterID"]] if "batterID" in row else None for row in rows]
+    df = df.reindex(columns=EVENT_COLUMNS)
+
+    df["xxBA"] = np.nan
+    is_hit = df.parse_error.isna() & (df.has_hit == True) & (df.has_bat == True)
+    if xxba_model is not None and is_hit.any():
+        with instrument.stage("xxba"):
+            prediction = xxba_model.predict(df.loc[is_hit, ["exit_velocity", "launch_angle"]])
+            df.loc[is_hit, "xxBA"] = np.asarray(prediction).squeeze()
+    return df
+
+
+def batched(iterable, n):
+    it = iter(iterable)
+    while batch := list(islice(it, n)):
+        yield batch
+
+
+def _parse_captured(path, keep_tracking=False):
+    """ parse_file, also returning the instrument stages it ran, to merge into the parent process's run """
+    with instrument.capture() as captured:
+        result = parse_file(path, keep_tracking)
+    return result, captured
+
+
+def _map(fn, paths, workers, chunksize):
+    if workers == 0:
+        yield from map(fn, paths)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        yield from pool.map(fn, paths, chunksize=chunksize)
+
+
+def parse_files(paths, workers=None, chunksize=16, keep_tracking=False):
+    """
+    Parse files over a process pool, skipping pitches without a hit unless their tracking data is kept.
+    :param workers: number of processes. None uses every CPU, 0 parses in this process
+    :param keep_tracking: whether to return tracking data along with the rows
+    :return: iterator of (fileID, row dict or None, PitchFrames or None), in the order of paths
+    """
+    profiling = instrument.enabled()
+    parse = partial(_parse_captured if profiling else parse_file, keep_tracking=keep_tracking)
+    for result in _map(parse, paths, workers, chunksize):
+        if profiling:
+            result, captured = result
+            instrument.merge(captured)
+        if result[1] is not None or result[2] is not None:
+            yield result
+
+
+def list_raw_files(raw_dir):
+    """ :return: sorted paths of the .jsonl files in raw_dir. sorted so batter names are assigned reproducibly """
+    return [os.path.join(raw_dir, f) for f in sorted(os.listdir(raw_dir)) if f.endswith(".jsonl")]
+
+
+def _copy_events(events_path, out_path, drop_ids, chunksize=50_000):
+    """
+    Copy the events table to out_path in chunks, leaving out rows whose fileID is in drop_ids.
+    :return: names of the batters whose rows were left out
+    """
+    dropped_batters = set()
+    header = True
+    for chunk in pd.read_csv(events_path, chunksize=chunksize, dtype={"fileID": str}):
+        chunk = chunk.reindex(columns=EVENT_COLUMNS)
+        drop = chunk.fileID.isin(drop_ids)
+        dropped_batters.update(chunk.batter_name[drop].dropna())
+        chunk[~drop].to_csv(out_path, mode="w" if header else "a", header=header, index=False)
+        header = False
+    if header:
+        pd.DataFrame(columns=EVENT_COLUMNS).to_csv(out_path, index=False)
+    return dropped_batters
+
+
+@instrument.profiled("ingest")
+def run(raw_dir=RAW_DIR, events_path=EVENTS_PATH, stats_path=STATS_PATH, xxba_path=None,
+        workers=None, batch_size=500, incremental=False,
+        manifest_path=manifest.MANIFEST_PATH, names_path=manifest.NAMES_PATH, tracking_path=None,
+        league_path=LEAGUE_PATH):
+    """
+    Parse the files in raw_dir, writing the events and stats tables, and optionally a tracking store.
+    Batter names given by earlier runs are kept, so reruns name batters the same way.
+    :param incremental: only parse files which are new or changed since the last run (according to the manifest),
+        and merge their rows into the existing events table. Only batters with new or changed rows get their stats
+        recomputed. Falls back to a full rebuild if there is no manifest, the events table has no fileID column, or
+        tracking_path is given but there is no store there yet.
+    :param tracking_path: directory of the tracking store to write tracking data of every parsed pitch to, with or
+        without a hit (see tracking_store.py). None to skip it
+    :param league_path: where to write league averages of the stats (see stats.save)
+    :return: number of rows parsed
+    """
+    # without a manifest, or with an events table from before fileIDs were stored, there is no telling which rows
+    # the files on disk already account for, so everything is rebuilt. so is a tracking store which doesn't exist yet,
+    # which would otherwise only get the changed files
+    incremental = (incremental and os.path.exists(events_path) and os.path.exists(stats_path)
+                   and os.path.exists(manifest_path)
+                   and "fileID" in pd.read_csv(events_path, nrows=0).columns
+                   and (tracking_path is None or tracking_store.exists(tracking_path)))
+    names = name_lookup(manifest.load_names(names_path))
+    previous = manifest.load_manifest(manifest_path) if incremental else {}
+    with instrument.stage("scan"):
+        current, to_parse, stale = manifest.scan(list_raw_files(raw_dir), previous)
+    instrument.count("files_unchanged", len(current) - len(to_parse))
+
+    # events: rows kept from the last run are copied first, then new rows are streamed in after them
+    tmp_path = events_path + ".tmp"
+    header = True
+    changed_batters = set()
+    if incremental:
+        if not to_parse and not stale:
+            manifest.save_manifest(current, manifest_path)  # mtimes may have changed
+            return 0
+        with instrument.stage("copy_events"):
+            changed_batters = _copy_events(events_path, tmp_path, stale)
+        header = False
+
+    tracking = None
+    if tracking_path is not None:
+        tracking = tracking_store.TrackingStoreWriter(tracking_path, append=incremental)
+        for fileID in stale:
+            tracking.remove(fileID)
+
+    xxba_model = load_xxba(xxba_path) if to_parse else None
+    n_rows = 0
+    new_rows = []  # only kept for incremental runs, which are small
+    for batch in batched(parse_files(to_parse, workers, keep_tracking=tracking is not None), batch_size):
+        rows = [row for _, row, _ in batch if row is not None]
+        if tracking is not None:
+            with instrument.stage("tracking_write"):
+                for fileID, _, pitch_frames in batch:
+                    if pitch_frames is not None:
+                        tracking.add(fileID, pitch_frames)
+        with instrument.stage("finish_rows"):
+            df = finish_rows(rows, names, xxba_model)
+        with instrument.stage("csv_write"):
+            df.to_csv(tmp_path, mode="w" if header else "a", header=header, index=False)
+        header = False
+        changed_batters.update(df.batter_name.dropna())
+        if incremental:
+            new_rows.append(df)
+        n_rows += len(df)
+        instrument.count("rows", len(df))
+    if header:  # no rows at all, still write the header
+        pd.DataFrame(columns=EVENT_COLUMNS).to_csv(tmp_path, index=False)
+    os.replace(tmp_path, events_path)
+    if tracking is not None:
+        tracking.close()
+
+    # stats
+    with instrument.stage("stats"):
+        old_stats = pd.read_csv(stats_path, index_col="batter_name") if incremental else None
+        if old_stats is not None and not set(stats.COUNT_COLUMNS) <= set(old_stats):
+            old_stats = None  # written before some of the counts were stored, so rebuild them from the events
+        if old_stats is not None and not stale:
+            # only new files: their rows can be added to the existing counts
+            new_stats = stats.append_events(old_stats,
+                                            pd.concat(new_rows) if new_rows else pd.DataFrame(columns=EVENT_COLUMNS))
+        elif old_stats is not None:
+            events = pd.read_csv(events_path)
+            new_stats = stats.update_batter_stats(old_stats, events, changed_batters)
+        else:
+            new_stats = stats.batter_stats(pd.read_csv(events_path))
+        stats.save(new_stats, stats_path, league_path)
+
+    manifest.save_names(dict(names), names_path)
+    manifest.save_manifest(current, manifest_path)
+    return n_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("raw_dir", nargs="?", default=RAW_DIR, help="directory of raw .jsonl files")
+    parser.add_argument("--events", default=EVENTS_PATH, help="output path of the events table")
+    parser.add_argument("--stats", default=STATS_PATH, help="output path of the per-batter stats table")
+    parser.add_argument("--league", default=LEAGUE_PATH, help="output path of the league averages of the stats")
+    parser.add_argument("--xxba", default=None, help=f"xxBA model (default: first of {XXBA_PATHS} which exists)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all CPUs, 0: none)")
+    parser.add_argument("--batch-size", type=int, default=500, help="rows written to the events table at a time")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only parse new or changed files, and merge them into the existing tables")
+    parser.add_argument("--manifest", default=manifest.MANIFEST_PATH, help="record of processed files")
+    parser.add_argument("--names", default=manifest.NAMES_PATH, help="record of the name given to each batter")
+    parser.add_argument("--tracking", default=None,
+                        help=f"also write tracking data to this store directory (eg. {tracking_store.STORE_PATH!r})")
+    args = parser.parse_args()
+
+    n_rows = run(args.raw_dir, args.events, args.stats, args.xxba, args.workers, args.batch_size,
+                 args.incremental, args.manifest, args.names, args.tracking, args.league)
+    print(f"wrote {n_rows} new rows to {args.events}")
+
+
+if __name__ == "__main__":
+    main()
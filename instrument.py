@@ -0,0 +1,261 @@
+"""
+Lightweight timing instrumentation for ingestion and the dashboard.
+
+Off unless the WISD_PROFILE environment variable is set, to a file path (summaries are appended to it as JSON lines)
+or to "stderr". When off, every hook returns immediately, so they can stay in the hot paths.
+
+Timings are collected into a run (eg. one ingest, or one rerun of a page), and a summary of the run is written when
+it ends: the number of calls, total and longest seconds of each stage, counters, and memory. Memory is the
+process's resident set size (RSS) at the start and end of the run, and for each stage, how much it grew over the
+stage (added up over calls) and the most it reached at the end of a call. These are read from /proc, so are left out
+on systems without it. max_rss_mib is the peak over the whole life of the process, which for long lived processes
+(the Streamlit server, pool workers) may come from any earlier run.
+- stage(name): context manager, timing a block. Stages may be nested, and times include any nested stages
+- region(name): for top-level scripts like the Streamlit pages. Ends the previous region and starts timing a new one,
+    so it can mark each "# region" block without indenting it. Regions are nested by naming them after their parent,
+    eg. "Stat Graphics/launch angle" is inside "Stat Graphics", which stays open until a region outside it starts
+- count(name, n): add to a counter
+- capture()/merge(): carry stages from a worker process back to the parent's run. worker stage times are added up
+    across processes, so they can exceed the run's wall time, and their memory is the workers' rather than the parent's
+Runs are per thread, since Streamlit runs each session's script in its own thread.
+
+Usage:
+    WISD_PROFILE=private/profile.jsonl python ingest.py
+    WISD_PROFILE=stderr streamlit run Home.py
+"""
+
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+ENV_VAR = "WISD_PROFILE"
+_STATM = "/proc/self/statm"  # sizes of this process's memory, in pages. the second is the resident set size
+
+_target = os.environ.get(ENV_VAR, "")
+_local = threading.local()
+_write_lock = threading.Lock()
+_NULL = contextlib.nullcontext()
+
+
+def enabled():
+    return bool(_target)
+
+
+def _rss():
+    """ :return: resident set size of this process in bytes, or None if it can't be read """
+    try:
+        with open(_STATM, "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, AttributeError, ValueError):
+        return None
+
+
+def _mib(n_bytes):
+    return n_bytes / 2 ** 20
+
+
+class Run:
+    """ timings and counters collected between begin_run and end_run """
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self._start_rss = _rss()
+        self.stages = {}  # name -> [calls, total seconds, longest seconds, RSS growth, largest RSS at the end]
+        self.counters = Counter()
+        self.regions = []  # (name, start, RSS at the start) of the open regions, outermost first
+
+    def add(self, name, seconds, calls=1, longest=None, rss_growth=None, max_rss=None):
+        entry = self.stages.setdefault(name, [0, 0., 0., None, None])
+        entry[0] += calls
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds if longest is None else longest)
+        if rss_growth is not None:
+            entry[3] = (entry[3] or 0) + rss_growth
+            entry[4] = max(entry[4] or 0, max_rss)
+
+    def open_region(self, name):
+        """ close the open regions which name isn't inside of, and open it """
+        while self.regions and not name.startswith(self.regions[-1][0] + "/"):
+            self.close_region()
+        self.regions.append((name, time.perf_counter(), _rss()))
+
+    def close_region(self):
+        """ close the innermost open region """
+        if self.regions:
+            name, start, start_rss = self.regions.pop()
+            self.add(name, time.perf_counter() - start, **_rss_change(start_rss))
+
+    def close_regions(self):
+        while self.regions:
+            self.close_region()
+
+    def summary(self):
+        summary = {
+            "run": self.name,
+            "started": self.started,
+            "seconds": time.perf_counter() - self._start,
+            "pid": os.getpid(),
+            "stages": {name: _stage_summary(*entry) for name, entry in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+        end_rss = _rss()
+        if self._start_rss is not None and end_rss is not None:
+            summary["start_rss_mib"] = _mib(self._start_rss)
+            summary["end_rss_mib"] = _mib(end_rss)
+        if resource is not None:
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            scale = 2 ** 20 if sys.platform == "darwin" else 2 ** 10
+            summary["max_rss_mib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+        return summary
+
+
+def _rss_change(start_rss):
+    """ :return: keyword arguments of Run.add for the memory of a stage which started with start_rss """
+    end_rss = _rss()
+    if start_rss is None or end_rss is None:
+        return {}
+    return {"rss_growth": end_rss - start_rss, "max_rss": end_rss}
+
+
+def _stage_summary(calls, total, longest, rss_growth, max_rss):
+    summary = {"calls": calls, "seconds": total, "max_seconds": longest}
+    if rss_growth is not None:
+        summary["rss_growth_mib"] = _mib(rss_growth)
+        summary["max_rss_mib"] = _mib(max_rss)
+    return summary
+
+
+def _current():
+    runs = getattr(_local, "runs", None)
+    return runs[-1] if runs else None
+
+
+def _emit(summary):
+    line = json.dumps(summary)
+    with _write_lock:
+        if _target == "stderr":
+            print(line, file=sys.stderr)
+        else:
+            with open(_target, "a") as f:
+                f.write(line + "\n")
+
+
+def begin_run(name):
+    """ start collecting a run in this thread. an unfinished run (eg. from an interrupted page rerun) is dropped """
+    if _target:
+        _local.runs = [Run(name)]
+
+
+def end_run():
+    """ finish this thread's run and write its summary """
+    run = _current()
+    if run is None:
+        return
+    run.close_regions()
+    _local.runs = []
+    _emit(run.summary())
+
+
+@contextlib.contextmanager
+def run(name):
+    """ context manager version of begin_run/end_run """
+    begin_run(name)
+    try:
+        yield
+    finally:
+        end_run()
+
+
+def profiled(name):
+    """ decorator, making each call of the function a run """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _target:
+                return fn(*args, **kwargs)
+            with run(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _Stage:
+    __slots__ = ("name", "start", "start_rss")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start_rss = _rss()
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        run = _current()
+        if run is not None:
+            run.add(self.name, seconds, **_rss_change(self.start_rss))
+
+
+def stage(name):
+    """ :return: context manager which times its block as stage name of the current run """
+    return _Stage(name) if _target else _NULL
+
+
+def region(name):
+    """
+    End the previous region of the current run, and start timing a new one.
+    :param name: region name. "parent/name" starts a region inside the open region parent, leaving it open
+    """
+    run = _current() if _target else None
+    if run is not None:
+        run.open_region(name)
+
+
+def count(name, n=1):
+    """ add n to counter name of the current run """
+    if _target:
+        run = _current()
+        if run is not None:
+            run.counters[name] += n
+
+
+@contextlib.contextmanager
+def capture():
+    """
+    Collect stages and counters separately from the current run, eg. in a worker process, to be sent back and
+    merged into the parent's run.
+    :return: context manager giving a dict, which is filled in with the stages and counters when the block ends
+    """
+    captured = {}
+    if not _target:
+        yield captured
+        return
+    _local.runs = getattr(_local, "runs", []) + [Run("capture")]
+    try:
+        yield captured
+    finally:
+        collected = _local.runs.pop()
+        captured["stages"] = collected.stages
+        captured["counters"] = collected.counters
+
+
+def merge(captured):
+    """ add stages and counters from capture() to the current run """
+    run = _current()
+    if run is None or not captured:
+        return
+    for name, (calls, total, longest, rss_growth, max_rss) in captured["stages"].items():
+        run.add(name, total, calls, longest, rss_growth, max_rss)
+    run.counters.update(captured["counters"])
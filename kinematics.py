@@ -0,0 +1,175 @@
+"""
+Vectorized velocity and acceleration estimates for whole trajectories.
+
+Every function works on ragged batches (see ragged.py): pass offsets to process many trajectories in one call,
+or leave offsets as None for a single trajectory. Windows never reach across trajectory boundaries.
+
+Estimators
+- "centred": (p[i+h] - p[i-h]) / (t[i+h] - t[i-h]), ie. the average velocity over a centred window of 2h+1 frames.
+    Acceleration is the same difference applied to the velocity.
+- "savgol": Savitzky-Golay filter. Fits a polynomial of degree polyorder to the 2h+1 frames around each point and
+    takes its derivative. Assumes samples are roughly evenly spaced within a trajectory.
+
+Edge handling, for frames within h of the start or end of a trajectory
+- "nan": leave them undefined (NaN).
+- "clamp": shrink the window to fit inside the trajectory. For "centred" this becomes a one-sided difference;
+    for "savgol" the end frames are repeated to pad the window.
+"""
+
+from collections import namedtuple
+from math import factorial
+
+import numpy as np
+
+import ragged
+
+ESTIMATORS = ("centred", "savgol")
+EDGES = ("nan", "clamp")
+
+Kinematics = namedtuple("Kinematics", ["velocity", "speed", "acceleration"])
+
+
+def _check_offsets(n, offsets):
+    if offsets is None:
+        return np.array([0, n], dtype=np.int64)
+    return np.asarray(offsets, dtype=np.int64)
+
+
+def _window_indices(offsets, half_window, edge):
+    """
+    :return: (N, 2h+1) indices of the window around each frame, and a (N,) mask of frames whose window is complete.
+        with edge="clamp" indices are clipped to the frame's trajectory.
+    """
+    start, stop = ragged.bounds(offsets)
+    idx = np.arange(offsets[-1])[:, None] + np.arange(-half_window, half_window + 1)
+    complete = (idx[:, 0] >= start) & (idx[:, -1] < stop)
+    if edge == "clamp":
+        idx = np.clip(idx, start[:, None], np.maximum(stop - 1, start)[:, None])
+    else:
+        idx = np.clip(idx, 0, max(offsets[-1] - 1, 0))
+    return idx, complete
+
+
+def _centred(time, values, offsets, half_window, edge):
+    """ first derivative of values (k, N) by centred difference """
+    idx, complete = _window_indices(offsets, half_window, edge)
+    lo, hi = idx[:, 0], idx[:, -1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = (values[:, hi] - values[:, lo]) / (time[hi] - time[lo])
+    out[:, hi == lo] = np.nan  # single-frame trajectories have no velocity
+    if edge == "nan":
+        out[:, ~complete] = np.nan
+    return out
+
+
+def savgol_coefficients(half_window, polyorder, deriv):
+    """
+    Savitzky-Golay weights for the deriv'th derivative at the centre of a window of 2h+1 unit-spaced samples.
+    :return: (2h+1,) array, to be dotted with the window and divided by (sample spacing) ** deriv
+    """
+    if not deriv <= polyorder < 2 * half_window + 1:
+        raise ValueError(f"need deriv <= polyorder < window length, got deriv={deriv}, polyorder={polyorder}, "
+                         f"window length={2 * half_window + 1}")
+    k = np.arange(-half_window, half_window + 1, dtype=float)
+    vandermonde = k[:, None] ** np.arange(polyorder + 1)
+    return np.linalg.pinv(vandermonde)[deriv] * factorial(deriv)
+
+
+def _savgol(time, values, offsets, half_window, polyorder, deriv, edge):
+    """ deriv'th derivative of values (k, N) by Savitzky-Golay filter """
+    idx, complete = _window_indices(offsets, half_window, edge)
+    coefs = savgol_coefficients(half_window, polyorder, deriv)
+
+    # mean sample spacing of each trajectory. undefined for single-frame trajectories
+    lengths = np.diff(offsets)
+    spacing = np.full(lengths.size, np.nan)
+    long = lengths > 1
+    spacing[long] = (time[offsets[1:][long] - 1] - time[offsets[:-1][long]]) / (lengths[long] - 1)
+
+    out = (values[:, idx] @ coefs) / np.repeat(spacing, lengths) ** deriv
+    if edge == "nan":
+        out[:, ~complete] = np.nan
+    return out
+
+
+def derivative(time, values, offsets=None, order=1, method="centred", half_window=2, polyorder=2, edge="nan"):
+    """
+    Time derivative of sampled values.
+    :param time: (N,) sample times, increasing within each trajectory
+    :param values: (k, N) or (N,) sampled values, eg. positions
+    :param offsets: trajectory offsets into time/values. None for a single trajectory
+    :param order: 1 for velocity, 2 for acceleration
+    :param method: one of ESTIMATORS
+    :param half_window: window covers half_window frames either side of each point
+    :param polyorder: polynomial degree for the "savgol" method
+    :param edge: one of EDGES
+    :return: array shaped like values
+    """
+    if method not in ESTIMATORS:
+        raise ValueError(f"unknown method {method!r}, expected one of {ESTIMATORS}")
+    if edge not in EDGES:
+        raise ValueError(f"unknown edge handling {edge!r}, expected one of {EDGES}")
+    if order not in (1, 2):
+        raise ValueError(f"order must be 1 or 2, got {order}")
+
+    time = np.asarray(time, dtype=float)
+    values = np.asarray(values, dtype=float)
+    squeeze = values.ndim == 1
+    values = np.atleast_2d(values)
+    offsets = _check_offsets(time.size, offsets)
+
+    if time.size == 0:
+        out = np.empty_like(values)
+    elif method == "savgol":
+        out = _savgol(time, values, offsets, half_window, polyorder, order, edge)
+    else:
+        out = _centred(time, values, offsets, half_window, edge)
+        if order == 2:
+            out = _centred(time, out, offsets, half_window, edge)
+    return out[0] if squeeze else out
+
+
+def kinematics(time, positions, offsets=None, acceleration=True, **options):
+    """
+    Velocity, speed and (optionally) acceleration of one or many trajectories.
+    :param time: (N,) sample times
+    :param positions: (3, N) x, y, z positions
+    :param offsets: trajectory offsets. None for a single trajectory
+    :param acceleration: whether to compute acceleration. If False, Kinematics.acceleration is None
+    :param options: passed to derivative (method, half_window, polyorder, edge)
+    :return: Kinematics(velocity (3, N), speed (N,), acceleration (3, N) or None)
+    """
+    velocity = derivative(time, positions, offsets, order=1, **options)
+    speed = np.sqrt((velocity ** 2).sum(axis=0))
+    accel = derivative(time, positions, offsets, order=2, **options) if acceleration else None
+    return Kinematics(velocity, speed, accel)
+
+
+def track_kinematics(tracks, acceleration=True, **options):
+    """
+    Compute kinematics for a batch of util.Track objects in one call, and store velocity and speed in each Track.
+    :param tracks: list of Tracks. None entries (eg. a pitch without bat tracking) are skipped
+    :param acceleration: whether to compute acceleration
+    :param options: passed to derivative (method, half_window, polyorder, edge)
+    :return: list of Kinematics, one per track (None for skipped entries)
+    """
+    present = [t for t in tracks if t is not None]
+    if not present:
+        return [None] * len(tracks)
+    time, offsets = ragged.concat([t.time for t in present])
+    positions, _ = ragged.concat([t.positions for t in present])
+    result = kinematics(time, positions, offsets, acceleration=acceleration, **options)
+
+    out = iter(zip(ragged.split(result.velocity, offsets),
+                   ragged.split(result.speed, offsets),
+                   ragged.split(result.acceleration, offsets) if acceleration else [None] * len(present)))
+    results = []
+    for track in tracks:
+        if track is None:
+            results.append(None)
+            continue
+        velocity, speed, accel = next(out)
+        track.velocity[:] = velocity
+        track.speed[:] = speed
+        results.append(Kinematics(velocity, speed, accel))
+    return results
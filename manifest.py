@@ -0,0 +1,95 @@
+"""
+Bookkeeping for incremental ingestion: which raw files have been processed, and which name each batter was given.
+
+Both are kept as JSON under the private data directory, since batter IDs identify real players.
+"""
+
+import hashlib
+import json
+import os
+
+MANIFEST_PATH = "private/ingest manifest.json"
+NAMES_PATH = "private/batter names.json"
+
+
+def file_id(path):
+    """ fileID of a raw file: its name without the .jsonl suffix """
+    return os.path.basename(path)[:-len(".jsonl")]
+
+
+def file_hash(path, block_size=1 << 20):
+    """ :return: sha1 hex digest of the file's contents """
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_record(path, previous=None):
+    """
+    Manifest entry for a raw file: its size, mtime and hash.
+    The file is only re-hashed when its size or mtime differ from the previous entry.
+    :param previous: dict. the file's last manifest entry, if any
+    """
+    stat = os.stat(path)
+    record = {"size": stat.st_size, "mtime": stat.st_mtime}
+    if previous is not None and previous["size"] == record["size"] and previous["mtime"] == record["mtime"]:
+        record["sha1"] = previous["sha1"]
+    else:
+        record["sha1"] = file_hash(path)
+    return record
+
+
+def _load_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _save_json(obj, path):
+    """ write to a temporary file first, so an interrupted run can't leave a half-written file """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(obj, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """ :return: dict of fileID -> {"size", "mtime", "sha1"}. empty if there is no manifest yet """
+    return _load_json(path)
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    _save_json(manifest, path)
+
+
+def scan(paths, manifest):
+    """
+    Compare raw files against the manifest.
+    :param paths: paths of every raw file currently on disk
+    :param manifest: manifest from the previous run
+    :return: (new manifest, paths of new or changed files, fileIDs which were changed or removed since last run)
+    """
+    current = {}
+    to_parse = []
+    for path in paths:
+        fid = file_id(path)
+        previous = manifest.get(fid)
+        current[fid] = file_record(path, previous)
+        if previous is None or previous["sha1"] != current[fid]["sha1"]:
+            to_parse.append(path)
+    stale = {fid for fid in manifest if fid not in current}
+    stale.update(file_id(p) for p in to_parse if file_id(p) in manifest)
+    return current, to_parse, stale
+
+
+def load_names(path=NAMES_PATH):
+    """ :return: dict of batter ID -> name, in the order names were assigned """
+    return {batter_id: name for batter_id, name in _load_json(path) or []}
+
+
+def save_names(names, path=NAMES_PATH):
+    # stored as [id, name] pairs so IDs keep their JSON type
+    _save_json([[batter_id, name] for batter_id, name in names.items()], path)
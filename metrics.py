@@ -0,0 +1,202 @@
+"""
+Bat metrics at the moment of contact, computed from a pitch's tracking data.
+Originally written in file parsing.ipynb
+
+batch_swing_metrics computes every metric for any number of pitches in one vectorized call, on ragged arrays of
+bat samples (see ragged.py). The bat is linearly interpolated to the hit time for its angles, and speeds are least
+squares slopes over the samples within WINDOW of the hit time, from per-pitch sums (the same fit as get_speed).
+The single-pitch functions below are kept as the reference implementation.
+"""
+
+import math
+
+import numpy as np
+from numpy.polynomial import Polynomial
+
+import ragged
+import util
+
+MPH_PER_FPS = 0.682  # converts from feet per second to miles per hour
+WINDOW = 0.01  # seconds either side of the hit time used to fit bat speed
+
+# keys of swing_metrics, in the order of the events table
+METRIC_COLUMNS = [
+    "bat_elevation", "bat_forward_tilt",
+    "head_speed", "head_speed_x", "head_speed_y", "head_speed_z",
+    "handle_speed", "handle_speed_x", "handle_speed_y", "handle_speed_z",
+]
+
+
+def _bat_at_contact(pitch_frames):
+    """ :return: head, handle positions (x, y, z) at the hit time. IndexError if there is no frame at the hit time """
+    t_contact = pitch_frames.hit_time
+    handle = pitch_frames.handle.positions[:, pitch_frames.handle.time == t_contact][:, 0]
+    head = pitch_frames.head.positions[:, pitch_frames.head.time == t_contact][:, 0]
+    return head, handle
+
+
+def bat_elevation_angle(pitch_frames):
+    """
+    determine the angle (in degrees) the bat makes against the horizontal plane at the moment of contact
+    :param pitch_frames: PitchFrames object
+    """
+    head, handle = _bat_at_contact(pitch_frames)
+    x = head[0]-handle[0]
+    y = head[1]-handle[1]
+    z = head[2]-handle[2]
+    bat_length = math.sqrt(x**2 + y**2 + z**2)
+    return math.degrees(math.asin(z/bat_length))
+
+
+def bat_forward_tilt_angle(pitch_frames):
+    """
+    determine the angle (in degrees) the bat makes against the plane of the strike box (x-z plane)
+    :param pitch_frames: PitchFrames object
+    """
+    head, handle = _bat_at_contact(pitch_frames)
+    x, y, z = head - handle
+    bat_length = math.sqrt(x**2 + y**2 + z**2)  # calculated from the tracking data
+    return math.degrees(math.asin(y/bat_length))
+
+
+def get_speed(frames, hit_time):
+    """determine the speed of the head at the moment of contact
+    :param frames: Track for the bat head OR handle
+    returns: speed, [x,y,z components] in miles per hour"""
+
+    x, y, z, t = util.extract_coords_from_frames(frames, hit_time-0.01, hit_time+0.01)
+    # have to .convert() otherwise values are scaled all funky
+    x_speed = MPH_PER_FPS * (Polynomial.fit(t, x, 1)).convert().coef[1]
+    y_speed = MPH_PER_FPS * (Polynomial.fit(t, y, 1)).convert().coef[1]
+    z_speed = MPH_PER_FPS * (Polynomial.fit(t, z, 1)).convert().coef[1]
+
+    return np.sqrt(x_speed**2 + y_speed**2 + z_speed**2), [x_speed, y_speed, z_speed]
+
+
+def _interpolate_at(time, values, offsets, queries):
+    """
+    :param time: (N,) sample times, sorted within each trajectory
+    :param values: (k, N) values at each sample
+    :param offsets: (P+1,) trajectory offsets
+    :param queries: (P,) one time per trajectory
+    :return: (k, P) values linearly interpolated to each query. NaN where the query is outside its trajectory
+    """
+    n = len(offsets) - 1
+    out = np.full((values.shape[0], n), np.nan)
+    known = ~np.isnan(queries)
+    if time.size == 0 or not known.any():
+        return out
+    start, stop = offsets[:-1], offsets[1:]
+    idx = ragged.searchsorted(time, offsets, np.where(known, queries, time[np.minimum(start, time.size - 1)]),
+                              np.arange(n + 1))
+    last = np.maximum(stop - 1, start)
+    hi = np.minimum(np.clip(idx, start, last), time.size - 1)
+    lo = np.minimum(np.clip(idx - 1, start, last), time.size - 1)
+    inside = known & (stop > start) & (queries >= time[lo]) & (queries <= time[hi])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        w = np.where(hi > lo, (queries - time[lo]) / (time[hi] - time[lo]), 0.)
+    interpolated = (1 - w) * values[:, lo] + w * values[:, hi]  # exact at sample times
+    out[:, inside] = interpolated[:, inside]
+    return out
+
+
+def _window_slopes(time, values, offsets, centre, half_width):
+    """
+    Least squares slope of values against time, over the samples strictly within half_width of each trajectory's
+    centre time. Equal to Polynomial.fit(t, x, 1).convert().coef[1], but from per-trajectory sums.
+    :param time: (N,) sample times
+    :param values: (k, N) values at each sample
+    :param offsets: (P+1,) trajectory offsets
+    :param centre: (P,) centre time of each trajectory's window
+    :return: (k, P) slopes. NaN for trajectories with fewer than 2 samples in their window
+    """
+    n = len(offsets) - 1
+    ids = ragged.segment_ids(offsets)
+    with np.errstate(invalid="ignore"):
+        inside = (time > (centre - half_width)[ids]) & (time < (centre + half_width)[ids])
+    ids = ids[inside]
+    dt = time[inside] - centre[ids]  # relative to the centre, for a well conditioned fit
+    values = values[:, inside]
+
+    count = np.bincount(ids, minlength=n)
+    sum_t = np.bincount(ids, weights=dt, minlength=n)
+    sum_tt = np.bincount(ids, weights=dt * dt, minlength=n)
+    denom = count * sum_tt - sum_t ** 2
+    slopes = np.empty((values.shape[0], n))
+    for row, x in enumerate(values):
+        sum_x = np.bincount(ids, weights=x, minlength=n)
+        sum_tx = np.bincount(ids, weights=dt * x, minlength=n)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slopes[row] = (count * sum_tx - sum_t * sum_x) / denom
+    slopes[:, (count < 2) | (denom <= 0)] = np.nan
+    return slopes
+
+
+def batch_swing_metrics(bat_time, head, handle, offsets, hit_time):
+    """
+    Bat metrics at contact for a ragged batch of pitches.
+    :param bat_time: (N,) bat sample times, sorted within each pitch
+    :param head: (3, N) bat head positions
+    :param handle: (3, N) bat handle positions
+    :param offsets: (P+1,) offsets of each pitch's bat samples
+    :param hit_time: (P,) hit time of each pitch. NaN if unknown
+    :return: dict of METRIC_COLUMNS -> (P,) arrays. NaN where the hit time is outside the bat tracking (angles),
+        or fewer than 2 bat samples are within WINDOW of it (speeds)
+    """
+    bat_time = np.asarray(bat_time, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    hit_time = np.asarray(hit_time, dtype=float)
+    bat = np.vstack([np.asarray(head, dtype=float), np.asarray(handle, dtype=float)])  # (6, N)
+
+    # angles of the bat at contact
+    at_contact = _interpolate_at(bat_time, bat, offsets, hit_time)
+    x, y, z = at_contact[:3] - at_contact[3:]
+    bat_length = np.sqrt(x ** 2 + y ** 2 + z ** 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = {
+            "bat_elevation": np.degrees(np.arcsin(z / bat_length)),
+            "bat_forward_tilt": np.degrees(np.arcsin(y / bat_length)),
+        }
+
+    # speeds, in mph
+    velocity = MPH_PER_FPS * _window_slopes(bat_time, bat, offsets, hit_time, WINDOW)
+    for body, (vx, vy, vz) in (("head", velocity[:3]), ("handle", velocity[3:])):
+        result[f"{body}_speed"] = np.sqrt(vx ** 2 + vy ** 2 + vz ** 2)
+        result[f"{body}_speed_x"] = vx
+        result[f"{body}_speed_y"] = vy
+        result[f"{body}_speed_z"] = vz
+    return result
+
+
+def pitches_swing_metrics(pitches):
+    """
+    batch_swing_metrics for a list of util.PitchFrames. Pitches without bat tracking or a hit time get NaN
+    :return: dict of METRIC_COLUMNS -> (P,) arrays
+    """
+    empty_time, empty_pos = np.empty(0), np.empty((3, 0))
+    with_bat = [p.has_bat() for p in pitches]
+    bat_time, offsets = ragged.concat([p.head.time if b else empty_time for p, b in zip(pitches, with_bat)])
+    head, _ = ragged.concat([p.head.positions if b else empty_pos for p, b in zip(pitches, with_bat)])
+    handle, _ = ragged.concat([p.handle.positions if b else empty_pos for p, b in zip(pitches, with_bat)])
+    if not pitches:
+        head = handle = empty_pos
+    hit_time = [np.nan if p.hit_time is None else p.hit_time for p in pitches]
+    return batch_swing_metrics(bat_time, head, handle, offsets, hit_time)
+
+
+def swing_metrics(pitch_frames):
+    """
+    all bat metrics for a single pitch, keyed by their column name in the events table
+    :param pitch_frames: PitchFrames object, with bat tracking and a hit time
+    :raises ValueError: if the metrics can't be computed, eg. the hit time is outside the bat tracking
+    """
+    if not pitch_frames.has_bat():
+        raise ValueError("pitch has no bat tracking")
+    if pitch_frames.hit_time is None:
+        raise ValueError("pitch has no hit time")
+    result = pitches_swing_metrics([pitch_frames])
+    if np.isnan(result["bat_elevation"][0]):
+        raise ValueError(f"hit time {pitch_frames.hit_time} is outside the bat tracking")
+    if np.isnan(result["head_speed"][0]) or np.isnan(result["handle_speed"][0]):
+        raise ValueError(f"fewer than 2 bat samples within {WINDOW} s of the hit time")
+    return {col: float(result[col][0]) for col in METRIC_COLUMNS}
@@ -1,17 +1,21 @@
-import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+import data
+import instrument
+import plots
 
-df = pd.read_csv("data/WISD events.csv")
-df = df[df.parse_error.isna()]
-df = df.drop("parse_error", axis=1)
-df = df[df.has_bat & df.has_hit]
+instrument.begin_run("page: Data Explorer")
+instrument.region("Load Data")
+index = data.filter_index()
+df = index.frame
+selection = index.all()  # bitmap of rows which pass the filters
 
 st.title("Data Explorer")
 st.write("Use this interactive plot to compare features and discover trends in the data!")
 
 st.subheader("Configure Plot")
 # region Filters
+instrument.region("Filters")
 with st.expander("Filters"):
     result_cols = st.columns(2)
     with result_cols[0]:
@@ -19,9 +23,10 @@ with st.expander("Filters"):
     with result_cols[1]:
         include_fouls = st.checkbox("Include Fouls", value=True)
 
-    hit_mask = (df.result == "HitIntoPlay") == include_hits
-    foul_mask = (df.result == "Strike") == include_fouls
-    df = df[hit_mask | foul_mask]
+    hit_mask = index.equals("result", "HitIntoPlay")
+    foul_mask = index.equals("result", "Strike")
+    selection = ((hit_mask if include_hits else index.invert(hit_mask)) |
+                 (foul_mask if include_fouls else index.invert(foul_mask)))
 
     batter_filter_options = {
         "all": "Include all batters",
@@ -33,7 +38,7 @@ with st.expander("Filters"):
                                  format_func=batter_filter_options.get,
                                  )
     if batter_filter in ["include", "exclude"]:
-        batter_counts = df.batter_name.value_counts()
+        batter_counts = index.value_counts("batter_name", selection)
         batters = st.multiselect(
             "Batter (# of hits)",
             batter_counts.index,
@@ -41,14 +46,15 @@ with st.expander("Filters"):
             placeholder="select batters..."
         )
         if batter_filter == "include":
-            df = df[df.batter_name.isin(batters)]
+            selection &= index.isin("batter_name", batters)
         elif batter_filter == "exclude":
-            df = df[~df.batter_name.isin(batters)]
+            selection &= index.invert(index.isin("batter_name", batters))
 
-    if df.size==0:
+    if index.count(selection) == 0:
         st.markdown("**WARNING:** Dataset is empty after applying filters!")
 # endregion Filters
 # region Colour Groups
+instrument.region("Colour Groups")
 with st.expander("Group Data"):
     group_feature = st.selectbox(
         label="Group By",
@@ -57,23 +63,24 @@ with st.expander("Group Data"):
     )
     match group_feature:
         case "None":
-            groups = [("_", True)]  # nightmare fuel line??
+            groups = [("_", selection)]
         case _:
-            group_options = df[group_feature].value_counts()
+            group_options = index.value_counts(group_feature, selection)
             group_highlight = st.multiselect(
                 label="Select groups to highlight",
                 options=group_options.index,
                 format_func=lambda name: f"{name} ({group_options[name]})",
-                default=df[group_feature].unique() if (group_options.size < 5) else None,
+                default=list(group_options.index) if (group_options.size < 5) else None,
                 placeholder="Select multiple...",
             )
 
-            groups = [(name, df[group_feature] == name) for name in group_highlight]
-            groups.insert(0, ("_all", True))
+            groups = [(name, index.equals(group_feature, name) & selection) for name in group_highlight]
+            groups.insert(0, ("_all", selection))
     st.write("Note: Changing filter settings may cause group settings to reset")
 # endregion Colour Groups
 
 # region Features
+instrument.region("Features")
 feature_cols = st.columns(2)
 with feature_cols[0]:
     x_feature = st.selectbox(
@@ -94,45 +101,69 @@ with feature_cols[0]:
         )
 # endregion Features
 # region Data Range
+instrument.region("Data Range")
 with st.expander("Data Range"):
+    x_values, y_values = index.values(x_feature, selection), index.values(y_feature, selection)
+    x_lo, x_hi = float(x_values.min()), float(x_values.max())
+    y_lo, y_hi = float(y_values.min()), float(y_values.max())
     x_min, x_max = st.slider(
         label="X Range",
-        min_value=df[x_feature].min(),
-        max_value=df[x_feature].max(),
+        min_value=x_lo,
+        max_value=x_hi,
         step=0.5,
-        value=(df[x_feature].min(), df[x_feature].max()),
+        value=(x_lo, x_hi),
         format="%.1f",
         key="x slider"
     )
     y_min, y_max = st.slider(
         label="Y Range",
-        min_value=df[y_feature].min(),
-        max_value=df[y_feature].max(),
+        min_value=y_lo,
+        max_value=y_hi,
         step=0.5,
-        value=(df[y_feature].min(), df[y_feature].max()),
+        value=(y_lo, y_hi),
         format="%.1f",
         key="y slider"
     )
 
 # True if point is within bounds
-range_mask = ((df[x_feature] > x_min) &
-              (df[x_feature] < x_max) &
-              (df[y_feature] > y_min) &
-              (df[y_feature] < y_max))
+range_mask = index.between(x_feature, x_min, x_max) & index.between(y_feature, y_min, y_max)
 
 # endregion Data Range
 # region Generate Figure
-fig, ax = plt.subplots()
-ax.set_xlabel(x_feature)
-ax.set_ylabel(y_feature)
-for label, g in groups:
-    ax.scatter(
-        (df[g & range_mask])[[x_feature]],
-        (df[g & range_mask])[[y_feature]],
-        label=label,
-        s=10
-    )
+instrument.region("Generate Figure")
+LARGE_N = 20_000  # above this many points, draw a density raster instead of every point
+large = index.count(selection & range_mask) > LARGE_N
+if large:
+    sample_size = st.slider("Points shown per highlighted group", min_value=0, max_value=2000, value=200, step=100,
+                            help="The full data set is large, so it is shown as a density plot.")
+
+
+def scatter_figure():
+    fig = Figure()
+    ax = fig.add_subplot()
+    ax.set_xlabel(x_feature)
+    ax.set_ylabel(y_feature)
+    x, y = df[x_feature].to_numpy(), df[y_feature].to_numpy()
+    if large:
+        rows = index.rows(selection & range_mask)
+        overlays = [(label, index.mask(g)[rows]) for label, g in groups if label not in ("_", "_all")]
+        plots.density_scatter(ax, x[rows], y[rows], overlays, sample=sample_size)
+    else:
+        for label, g in groups:
+            rows = index.rows(g & range_mask)
+            ax.scatter(x[rows], y[rows], label=label, s=10)
+
+    ax.legend()
+    return fig
+
 
-ax.legend()
-st.pyplot(fig=fig)
+# everything the figure depends on
+figure_key = (
+    "scatter", data.events_version(), include_hits, include_fouls, batter_filter,
+    tuple(sorted(batters)) if batter_filter in ["include", "exclude"] else None,
+    group_feature, tuple(label for label, _ in groups), x_feature, y_feature, x_min, x_max, y_min, y_max,
+    sample_size if large else None
+)
+st.image(data.figure_cache().get(figure_key, scatter_figure), width="stretch")
 # endregion
+instrument.end_run()
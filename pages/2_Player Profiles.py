@@ -1,27 +1,16 @@
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
+import data
+import instrument
 import plots
-from plots import FigAx
+from stats import STAT_LABELS, batter_table
 
+instrument.begin_run("page: Player Profiles")
 # region Load Data
-df = pd.read_csv("data/WISD events.csv")
-df = df[df.parse_error.isna()]  # only retain rows without parse errors
-df = df.drop("parse_error", axis=1)  # remove parse_error column
-gp = df.groupby(["batter_name"])
-stats = pd.read_csv("data/WISD stats.csv", index_col="batter_name")
-stats = stats[["pitches_received", "hits", "fouls", "fair_foul_ratio", "avg_xxBA"]]
-
-ranks_low = (  # lower value -> better rank
-    stats[["fouls"]]
-    .rank(ascending=True, na_option="top", method="min")
-)
-ranks_high = (  # bigger value -> better rank
-    stats[["pitches_received", "hits", "fair_foul_ratio", "avg_xxBA"]]
-    .rank(ascending=False, na_option="bottom", method="max")
-)
-ranks = pd.concat([ranks_low, ranks_high], axis=1)
-avgs = stats.agg("mean")
+instrument.region("Load Data")
+df = data.load_events()
+gp = df.groupby(["batter_name"], observed=True)
+stats, ranks, avgs = data.load_stats()
+angle_counts = data.load_angle_counts()  # spray/launch angle histograms of every batter
 # endregion Load Data
 
 st.title("Player Profiles")
@@ -35,79 +24,61 @@ batter = st.selectbox("Select a batter (# of hits)",
 
 
 # region Stats Table
-def format_rank(rank):
-    match rank % 10:
-        case 1:
-            rank_repr = f"{rank:n}st"
-        case 2:
-            rank_repr = f"{rank:n}nd"
-        case _:
-            rank_repr = f"{rank:n}th"
-    return rank_repr
-
-
-metric_labels = {
-    "pitches_received": "Swings",
-    "hits": "Hits",
-    "fouls": "Fouls",
-    "fair_foul_ratio": "Fair-Foul Ratio",
-    "avg_xxBA": "Average Estimated xBA"
-}
-batter_stats = stats.loc[[batter]].transpose(copy=True)
-batter_stats.insert(0, "Rank", ranks.loc[batter].apply(format_rank))
-batter_stats["League Average"] = avgs
-batter_stats.reindex(metric_labels.keys())
-batter_stats.index = [metric_labels[x] for x in batter_stats.index]
+instrument.region("Stats Table")
+batter_stats = batter_table(batter, stats, ranks, avgs)
 st.table(batter_stats)
 # endregion Stats Table
 
+# region Similar Batters
+instrument.region("Similar Batters")
+st.subheader("Most Similar Batters")
+st.caption("By bat speed and angles, exit velocity, launch and spray angles and average estimated xBA")
+similar = data.similarity_index().similar(batter, k=5)
+similar_stats = stats.reindex(similar.index)[list(STAT_LABELS)].rename(columns=STAT_LABELS)
+similar_stats.insert(0, "Distance", similar)
+st.dataframe(similar_stats)
+# endregion Similar Batters
+
 # region Stat Graphics
+instrument.region("Stat Graphics")
 bat_df = gp.get_group((batter,))
+figures = data.figure_cache()  # rendered figures, shared by every session
+version = data.events_version()
+launch_counts, spray_counts = angle_counts["launch_angle"], angle_counts["spray_angle"]
 
 # region launch angle
+instrument.region("Stat Graphics/launch angle")
 st.subheader("Launch Angle")
 launch_columns = st.columns(2)
 with launch_columns[0]:  # batter
-    launch_batter = FigAx(*plt.subplots(1, 1, subplot_kw=dict(projection='polar')))
-    plots.launch_plot(launch_batter.ax, bat_df.launch_angle)
-    launch_batter.ax.set_title(batter)
-    st.pyplot(launch_batter.fig)
+    st.image(figures.get(("launch", batter, version),
+                         lambda: plots.launch_figure(launch_counts.loc[batter], batter)), width="stretch")
 with launch_columns[1]:  # league overall
-    launch_league = FigAx(*plt.subplots(1, 1, subplot_kw=dict(projection="polar")))
-    plots.launch_plot(launch_league.ax, df.launch_angle)
-    launch_league.ax.set_title("League Overall")
-    st.pyplot(launch_league.fig)
+    st.image(figures.get(("launch", None, version),
+                         lambda: plots.launch_figure(launch_counts.sum(), "League Overall")), width="stretch")
 # endregion launch angle
 
 # region spray angle
+instrument.region("Stat Graphics/spray angle")
 st.subheader("Spray Angle")
 spray_columns = st.columns(2)
 with spray_columns[0]:  # batter
-    spray_batter = FigAx(*plt.subplots(1, 1, subplot_kw=dict(projection='polar')))
-    plots.spray_plot(spray_batter.ax, bat_df.spray_angle)
-    spray_batter.ax.set_title(batter)
-    st.pyplot(spray_batter.fig)
+    st.image(figures.get(("spray", batter, version),
+                         lambda: plots.spray_figure(spray_counts.loc[batter], batter)), width="stretch")
 with spray_columns[1]:  # league overall
-    spray_league = FigAx(*plt.subplots(1, 1, subplot_kw=dict(projection="polar")))
-    plots.spray_plot(spray_league.ax, df.spray_angle)
-    spray_league.ax.set_title("League Overall")
-    st.pyplot(spray_league.fig)
+    st.image(figures.get(("spray", None, version),
+                         lambda: plots.spray_figure(spray_counts.sum(), "League Overall")), width="stretch")
 # endregion spray angle
 
 # region exit velocity
+instrument.region("Stat Graphics/exit velocity")
 st.subheader("Exit Velocity")
-exitv_ecdf = FigAx(*plt.subplots())
-exitv_ecdf.ax.ecdf(bat_df.exit_velocity, complementary=True, label=batter)
-exitv_ecdf.ax.ecdf(df.exit_velocity.dropna(), complementary=True, label="League Overall")
-
-exitv_ecdf.ax.set_xlim(0, 120)
-exitv_ecdf.ax.legend()
-exitv_ecdf.ax.set_xlabel("Exit Velocity (mph)")
-exitv_ecdf.ax.set_ylabel("Portion of Batted Balls Exceeding")
-exitv_ecdf.ax.grid(which="major", linestyle='-')
-exitv_ecdf.ax.grid(which="minor", linestyle="--")
-st.pyplot(exitv_ecdf.fig)
+st.image(figures.get(("exit_velocity", batter, version),
+                     lambda: plots.exit_velocity_figure(bat_df.exit_velocity, df.exit_velocity.dropna(), batter)),
+         width="stretch")
 # endregion exit velocity
 # endregion Stat Graphics
+instrument.region("Raw Data")
 with st.expander("Raw Data"):
     st.dataframe(data=gp.get_group((batter,)))
+instrument.end_run()
@@ -1,5 +1,9 @@
 from collections import namedtuple
 import numpy as np
+from matplotlib.colors import LogNorm
+from matplotlib.figure import Figure
+
+from angles import LAUNCH_BINS, SPRAY_BINS, angle_counts
 
 FigAx = namedtuple("Subplots", ["fig", "ax"])
 
@@ -59,13 +63,31 @@ def circular_hist(ax, x, bins=16, density=True, offset=0, gaps=True):
     # Bin data and record counts
     n, bins = np.histogram(x, bins=bins)
 
+    patches = circular_bars(ax, n, bins, density=density, offset=offset, total=x.size)
+    return n, bins, patches
+
+
+def circular_bars(ax, n, bins, density=True, offset=0, total=None):
+    """
+    Draw already binned angles as a circular histogram on ax. See circular_hist
+    :param ax: axis instance created with subplot_kw=dict(projection='polar')
+    :param n: count in each bin
+    :param bins: bin edges (radians), one more than n
+    :param density: plot frequency proportional to area, rather than radius
+    :param offset: location of the 0 direction (radians)
+    :param total: number of angles the densities are relative to. defaults to n.sum()
+    :return: BarContainer
+    """
+    n = np.asarray(n)
+    total = n.sum() if total is None else total
+
     # Compute width of each bin
     widths = np.diff(bins)
 
     # By default plot frequency proportional to area
     if density:
         # Area to assign each bin
-        area = n / x.size
+        area = n / max(total, 1)
         # Calculate corresponding bin radius
         radius = (area / np.pi) ** .5
     # Otherwise plot frequency proportional to radius
@@ -83,7 +105,34 @@ def circular_hist(ax, x, bins=16, density=True, offset=0, gaps=True):
     if density:
         ax.set_yticks([])
 
-    return n, bins, patches
+    return patches
+
+
+def _angle_ticks(ax, bins):
+    ax.set_xticks(np.pi / 180. * np.linspace(180, -180, bins, endpoint=False))
+    ax.set_xlim(-np.pi / 2, np.pi / 2)
+
+
+def spray_counts_plot(ax, counts):
+    """
+    Plot binned spray angles as a circular histogram on ax.
+    :param ax: axis instance created with subplot_kw=dict(projection='polar').
+    :param counts: SPRAY_BINS counts, from angle_counts
+    :return: None
+    """
+    circular_bars(ax, counts, np.linspace(-np.pi, np.pi, SPRAY_BINS + 1), offset=np.pi / 2)
+    _angle_ticks(ax, SPRAY_BINS)
+
+
+def launch_counts_plot(ax, counts):
+    """
+    Plot binned launch angles as a circular histogram on ax.
+    :param ax: axis instance created with subplot_kw=dict(projection='polar').
+    :param counts: LAUNCH_BINS counts, from angle_counts
+    :return: None
+    """
+    circular_bars(ax, counts, np.linspace(-np.pi, np.pi, LAUNCH_BINS + 1))
+    _angle_ticks(ax, LAUNCH_BINS)
 
 
 def spray_plot(ax, angles):
@@ -94,9 +143,7 @@ def spray_plot(ax, angles):
     :param angles: list, np.ndarray, pd.Series of angles (in degrees)
     :return: None
     """
-    circular_hist(ax, np.deg2rad(angles), bins=16, offset=np.pi/2, gaps=False)
-    ax.set_xticks(np.pi / 180. * np.linspace(180, -180, 16, endpoint=False))
-    ax.set_xlim(-np.pi / 2, np.pi / 2)
+    spray_counts_plot(ax, angle_counts(angles, SPRAY_BINS))
 
 
 def launch_plot(ax, angles):
@@ -107,6 +154,95 @@ def launch_plot(ax, angles):
     :param angles: list, np.ndarray, pd.Series of angles (in degrees)
     :return: None
     """
-    circular_hist(ax, np.deg2rad(angles), bins=12, gaps=False)
-    ax.set_xticks(np.pi / 180. * np.linspace(180, -180, 12, endpoint=False))
-    ax.set_xlim(-np.pi / 2, np.pi / 2)
+    launch_counts_plot(ax, angle_counts(angles, LAUNCH_BINS))
+
+
+def density_scatter(ax, x, y, groups=(), bins=120, sample=0):
+    """
+    Scatter plot for data too large to draw point by point.
+    All points are binned into a 2D histogram and drawn as a (log scaled) density raster. Each group is overlaid as
+    density contours, and optionally a random sample of its points.
+    :param ax: matplotlib Axes
+    :param x: array of x values
+    :param y: array of y values
+    :param groups: list of (label, boolean mask) pairs to overlay
+    :param bins: number of bins along each axis
+    :param sample: number of points of each group to draw on top. 0 for none
+    :return: None
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    finite = np.isfinite(x) & np.isfinite(y)
+    if not finite.any():
+        return
+    extent = [[x[finite].min(), x[finite].max()], [y[finite].min(), y[finite].max()]]
+    counts, x_edges, y_edges = np.histogram2d(x[finite], y[finite], bins=bins, range=extent)
+    ax.imshow(np.ma.masked_equal(counts.T, 0), origin="lower", aspect="auto", cmap="Greys", norm=LogNorm(),
+              extent=(x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]), interpolation="nearest")
+
+    x_mid, y_mid = (x_edges[:-1] + x_edges[1:]) / 2, (y_edges[:-1] + y_edges[1:]) / 2
+    for i, (label, mask) in enumerate(groups):
+        mask = np.asarray(mask, dtype=bool) & finite
+        colour = f"C{i}"
+        group_counts, _, _ = np.histogram2d(x[mask], y[mask], bins=[x_edges, y_edges])
+        if group_counts.max() >= 2:  # contours need some variation
+            ax.contour(x_mid, y_mid, group_counts.T, levels=np.linspace(0, group_counts.max(), 5)[1:-1],
+                       colors=colour, linewidths=1)
+        ax.plot([], [], color=colour, label=f"{label} ({mask.sum()})")  # legend entry
+        if sample:
+            rows = np.flatnonzero(mask)
+            rows = np.sort(np.random.default_rng(i).choice(rows, min(sample, rows.size), replace=False))
+            ax.scatter(x[rows], y[rows], s=4, color=colour)
+
+
+def _polar_figure():
+    fig = Figure()
+    return FigAx(fig, fig.add_subplot(projection="polar"))
+
+
+def launch_figure(counts, title):
+    """
+    Launch angle histogram as a standalone figure.
+    Uses matplotlib.figure.Figure rather than pyplot, so it needs no closing and is safe to render in any thread.
+    :param counts: LAUNCH_BINS counts, from angle_counts (see also stats.angle_counts)
+    :param title: str
+    :return: Figure
+    """
+    fig, ax = _polar_figure()
+    launch_counts_plot(ax, counts)
+    ax.set_title(title)
+    return fig
+
+
+def spray_figure(counts, title):
+    """
+    Spray angle histogram as a standalone figure. See launch_figure
+    :param counts: SPRAY_BINS counts, from angle_counts (see also stats.angle_counts)
+    :param title: str
+    :return: Figure
+    """
+    fig, ax = _polar_figure()
+    spray_counts_plot(ax, counts)
+    ax.set_title(title)
+    return fig
+
+
+def exit_velocity_figure(batter_velocity, league_velocity, batter):
+    """
+    Exceedance curves of a batter's exit velocities, against the whole league's.
+    :param batter_velocity: exit velocities of the batter's batted balls (mph)
+    :param league_velocity: exit velocities of every batted ball (mph)
+    :param batter: batter's name, for the legend
+    :return: Figure
+    """
+    fig = Figure()
+    ax = fig.add_subplot()
+    ax.ecdf(batter_velocity, complementary=True, label=batter)
+    ax.ecdf(league_velocity, complementary=True, label="League Overall")
+
+    ax.set_xlim(0, 120)
+    ax.legend()
+    ax.set_xlabel("Exit Velocity (mph)")
+    ax.set_ylabel("Portion of Batted Balls Exceeding")
+    ax.grid(which="major", linestyle='-')
+    ax.grid(which="minor", linestyle="--")
+    return fig
@@ -0,0 +1,77 @@
+"""
+Helpers for ragged arrays: many variable-length trajectories stored back to back in one array,
+with offsets marking where each one starts and stops (trajectory i is values[..., offsets[i]:offsets[i+1]]).
+"""
+
+import numpy as np
+
+
+def concat(arrays):
+    """
+    Join arrays end to end along their last axis.
+    :param arrays: sequence of arrays with matching leading dimensions
+    :return: values, offsets
+    """
+    lengths = [np.shape(a)[-1] for a in arrays]
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    if not arrays:
+        return np.empty(0), offsets
+    return np.concatenate(arrays, axis=-1), offsets
+
+
+def split(values, offsets):
+    """ inverse of concat. returns views into values """
+    return [values[..., start:stop] for start, stop in zip(offsets[:-1], offsets[1:])]
+
+
+def segment_ids(offsets):
+    """ :return: for each element, the index of the trajectory it belongs to """
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+
+def bounds(offsets):
+    """ :return: (start, stop) of the trajectory each element belongs to, one entry per element """
+    ids = segment_ids(offsets)
+    return offsets[:-1][ids], offsets[1:][ids]
+
+
+
+def searchsorted(values, offsets, queries, query_offsets):
+    """
+    np.searchsorted (side="left") within each trajectory, for every trajectory at once.
+    :param values: (N,) values of each trajectory, sorted within the trajectory. eg. sample times
+    :param offsets: trajectory offsets into values
+    :param queries: (M,) values to look up
+    :param query_offsets: offsets into queries. queries for trajectory i are only searched for in trajectory i,
+        so both offset arrays must describe the same number of trajectories
+    :return: (M,) indices into values, each within [start, stop] of the query's trajectory
+    """
+    values = np.asarray(values, dtype=float)
+    queries = np.asarray(queries, dtype=float)
+    if values.size == 0 or queries.size == 0:
+        return np.repeat(offsets[:-1], np.diff(query_offsets))
+
+    # shift each trajectory into its own disjoint range, so a single sorted search covers all of them
+    low = min(values.min(), queries.min())
+    span = max(values.max(), queries.max()) - low + 1
+    key = (values - low) + segment_ids(offsets) * span
+    query_ids = segment_ids(query_offsets)
+    idx = np.searchsorted(key, (queries - low) + query_ids * span)
+    return np.clip(idx, offsets[:-1][query_ids], offsets[1:][query_ids])
+
+
+def argmin(values, offsets):
+    """
+    :return: (n_trajectories,) index of the smallest value of each trajectory (first one, on ties).
+        -1 for empty trajectories, or trajectories which are all NaN
+    """
+    values = np.asarray(values, dtype=float)
+    ids = segment_ids(offsets)
+    order = np.lexsort((np.where(np.isnan(values), np.inf, values), ids))
+    lengths = np.diff(offsets)
+    out = np.full(lengths.size, -1, dtype=np.int64)
+    nonempty = lengths > 0
+    out[nonempty] = order[offsets[:-1][nonempty]]
+    out[nonempty] = np.where(np.isnan(values[out[nonempty]]), -1, out[nonempty])
+    return out
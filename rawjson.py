@@ -0,0 +1,96 @@
+"""
+Lazy decoding of raw WISD files.
+
+Most of a raw file is tracking samples (samples_ball, samples_bat), but whether a pitch is kept at all only depends
+on the small events and summary_acts fields. RawPitch finds where each top-level field's value starts and ends
+without decoding anything, so the small fields can be decoded on their own first, and the samples only for pitches
+which are kept.
+
+orjson is used to decode JSON when it is installed (pip install orjson), otherwise the standard json module.
+"""
+
+import json
+import re
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+loads = orjson.loads if orjson is not None else json.loads
+
+_FIELD_RE = re.compile(rb'"(events|summary_acts|samples_ball|samples_bat)"\s*:\s*')
+_SCALAR_RE = re.compile(rb"[^,}\s]*")
+
+
+def _backslashes_before(text, end):
+    """ :return: length of the run of backslashes which ends just before text[end] """
+    start = end
+    while start and text[start - 1] == ord("\\"):
+        start -= 1
+    return end - start
+
+
+class RawPitch:
+    """
+    A raw WISD file, decoded one top-level field at a time. Fields are read like a dict (raw["events"]),
+    and decoded on first access.
+    """
+
+    def __init__(self, text):
+        """ :param text: bytes of the file """
+        self._text = text
+        self._spans = self._find_fields(text)
+        self._decoded = {}
+
+    @staticmethod
+    def open(path):
+        with open(path, "rb") as f:
+            return RawPitch(f.read())
+
+    @staticmethod
+    def _find_fields(text):
+        """ :return: dict of field name -> (start, end) of its value in text, for the fields in _FIELD_RE """
+        buf = np.frombuffer(text, dtype=np.uint8)
+        # quotes which open or close a string, ie. not escaped by an odd number of backslashes
+        quotes = np.flatnonzero(buf == ord('"'))
+        after_backslash = np.flatnonzero(buf[np.maximum(quotes - 1, 0)] == ord("\\"))
+        if after_backslash.size:
+            escaped = [i for i in after_backslash if _backslashes_before(text, int(quotes[i])) % 2]
+            quotes = np.delete(quotes, escaped)
+        # brackets outside strings, ie. with an even number of quotes before them
+        brackets = np.flatnonzero((buf == ord("{")) | (buf == ord("[")) | (buf == ord("}")) | (buf == ord("]")))
+        brackets = brackets[(np.searchsorted(quotes, brackets) & 1) == 0]
+        is_open = (buf[brackets] == ord("{")) | (buf[brackets] == ord("["))
+        depth = np.cumsum(np.where(is_open, 1, -1))  # nesting depth after each bracket. 1 inside the root object
+
+        spans = {}
+        for match in _FIELD_RE.finditer(text):
+            key = match.start()
+            previous = np.searchsorted(brackets, key) - 1
+            if previous < 0 or depth[previous] != 1 or np.searchsorted(quotes, key) & 1:
+                continue  # not a key of the root object
+            start = match.end()
+            if text[start] in b"[{":
+                # the value ends at the bracket which brings the depth back to the root object's
+                first = previous + 1
+                end = int(brackets[first + np.argmax(depth[first:] == 1)]) + 1
+            else:  # eg. null
+                end = _SCALAR_RE.match(text, start).end()
+            spans[match.group(1).decode()] = (start, end)
+        return spans
+
+    def raw(self, field):
+        """ :return: undecoded bytes of a field's value """
+        start, end = self._spans[field]
+        return self._text[start:end]
+
+    def __contains__(self, field):
+        return field in self._spans
+
+    def __getitem__(self, field):
+        if field not in self._decoded:
+            self._decoded[field] = loads(self.raw(field))
+        return self._decoded[field]
@@ -0,0 +1,69 @@
+"""
+Similar batters, by nearest neighbours between per-batter feature profiles.
+
+A batter's profile is the mean and spread of their swing and batted ball metrics, their spray and launch angle
+histograms (as shares of their batted balls) and their average xxBA. Features are standardized across batters so
+each counts equally, and each histogram is scaled down to count as much as one feature overall. The standardized
+profiles are kept in a KD-tree, so finding a batter's neighbours doesn't compare them with every other batter.
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+import stats
+
+PROFILE_COLUMNS = ["head_speed", "bat_elevation", "bat_forward_tilt", "exit_velocity"]
+
+
+def batter_profiles(events):
+    """
+    :param events: events DataFrame, as written by ingest.py
+    :return: DataFrame of features, indexed by batter_name
+    """
+    if "parse_error" in events:
+        events = events[events.parse_error.isna()]
+    grouped = events.groupby("batter_name", observed=True)[PROFILE_COLUMNS]
+    features = [grouped.mean().add_suffix("_mean"), grouped.std().add_suffix("_std")]
+
+    batter_stats = stats.batter_stats(events)
+    for col, counts in stats.angle_counts(batter_stats).items():
+        totals = counts.sum(axis=1)
+        shares = counts.div(totals.where(totals > 0), axis=0)
+        features.append(shares.add_prefix(f"{col}_"))
+    features.append(batter_stats[["avg_xxBA"]])
+    return pd.concat(features, axis=1).sort_index()
+
+
+class SimilarityIndex:
+    """ KD-tree over standardized batter profiles """
+
+    def __init__(self, profiles):
+        """ :param profiles: DataFrame from batter_profiles """
+        self.batters = profiles.index
+        values = profiles.to_numpy(dtype=float)
+        with np.errstate(invalid="ignore"):  # features without any values
+            mean = np.nanmean(values, axis=0)
+            std = np.nanstd(values, axis=0)
+        std[~(std > 0)] = 1  # features which are the same for everyone
+        features = (values - mean) / std
+        features[np.isnan(features)] = 0  # missing values count as the league average
+
+        # each histogram as a whole weighs as much as one feature
+        weights = np.ones(profiles.shape[1])
+        for col, bins in stats.ANGLE_BINS.items():
+            weights[profiles.columns.str.startswith(f"{col}_")] = 1 / np.sqrt(bins)
+        self.features = features * weights
+        self.tree = KDTree(self.features)
+
+    def similar(self, batter, k=5):
+        """
+        :param batter: batter_name
+        :param k: number of batters to return
+        :return: Series of distance to the k most similar other batters, indexed by batter_name, nearest first
+        """
+        i = self.batters.get_loc(batter)
+        k = min(k, len(self.batters) - 1)
+        distances, indices = self.tree.query(self.features[i:i + 1], k=k + 1)
+        others = indices[0] != i
+        return pd.Series(distances[0][others][:k], index=self.batters[indices[0][others][:k]], name="distance")
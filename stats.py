@@ -0,0 +1,188 @@
+"""
+Per-batter statistics, built from the events table.
+
+Every aggregate is computed in one vectorized pass (np.bincount over batter codes). Alongside the stats, the table
+keeps the sums they are derived from (eg. xxBA_sum, xxBA_count), so new events can be added without rereading old
+ones, and each stat's rank, so pages only need to look ranks up. It also keeps each batter's spray and launch angle
+histogram counts (see angles.angle_counts), which add up the same way.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+import angles
+
+STATS_PATH = "data/WISD stats.csv"
+LEAGUE_PATH = "data/WISD league.csv"
+
+STAT_COLUMNS = ["pitches_received", "hits", "fouls", "fair_foul_ratio", "avg_xxBA"]
+LOW_IS_BETTER = ["fouls"]
+HIGH_IS_BETTER = ["pitches_received", "hits", "fair_foul_ratio", "avg_xxBA"]
+STAT_LABELS = {
+    "pitches_received": "Swings",
+    "hits": "Hits",
+    "fouls": "Fouls",
+    "fair_foul_ratio": "Fair-Foul Ratio",
+    "avg_xxBA": "Average Estimated xBA"
+}
+
+# angle column -> number of histogram bins. bin i of each is stored as <angle column>_<i>
+ANGLE_BINS = {"spray_angle": angles.SPRAY_BINS, "launch_angle": angles.LAUNCH_BINS}
+HISTOGRAM_COLUMNS = [f"{col}_{i}" for col, bins in ANGLE_BINS.items() for i in range(bins)]
+
+# columns which can be added up across batches of events. everything else is derived from these
+COUNT_COLUMNS = ["pitches_received", "hits", "fouls", "xxBA_sum", "xxBA_count"] + HISTOGRAM_COLUMNS
+
+
+def _counts(events):
+    """ :return: DataFrame of COUNT_COLUMNS, indexed by batter_name """
+    if "parse_error" in events:
+        events = events[events.parse_error.isna()]  # only retain rows without parse errors
+    codes, batters = pd.factorize(events.batter_name, sort=True)
+    keep = codes >= 0  # rows without a batter name can't be attributed to anyone
+    codes = codes[keep]
+    result = np.asarray(events.result, dtype=object)[keep]
+    xxba = np.asarray(events.xxBA, dtype=float)[keep]
+    scored = ~np.isnan(xxba)
+
+    n = len(batters)
+    counts = pd.DataFrame({
+        "pitches_received": np.bincount(codes, minlength=n),
+        "hits": np.bincount(codes[result == "HitIntoPlay"], minlength=n),
+        "fouls": np.bincount(codes[result == "Strike"], minlength=n),
+        "xxBA_sum": np.bincount(codes[scored], weights=xxba[scored], minlength=n).astype(float),
+        "xxBA_count": np.bincount(codes[scored], minlength=n),
+    }, index=pd.Index(np.asarray(batters), name="batter_name"))
+    for col, bins in ANGLE_BINS.items():
+        histograms = angles.angle_counts(np.asarray(events[col], dtype=float)[keep], bins, codes, n)
+        counts[[f"{col}_{i}" for i in range(bins)]] = histograms
+    return counts
+
+
+def _finish(counts):
+    """ derive the stats and their ranks from COUNT_COLUMNS """
+    stats = counts[COUNT_COLUMNS].copy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stats["avg_xxBA"] = stats.xxBA_sum / stats.xxBA_count.where(stats.xxBA_count > 0)
+        stats["fair_foul_ratio"] = stats.hits / stats.fouls
+    stats.replace([np.inf], np.nan, inplace=True)
+    stats = stats[STAT_COLUMNS + ["xxBA_sum", "xxBA_count"] + HISTOGRAM_COLUMNS]
+    return pd.concat([stats, _rank(stats).add_suffix("_rank")], axis=1).sort_index()
+
+
+def _rank(stats):
+    """ rank of each batter in each of STAT_COLUMNS. 1 is best """
+    ranks_low = (  # lower value -> better rank
+        stats[LOW_IS_BETTER]
+        .rank(ascending=True, na_option="top", method="min")
+    )
+    ranks_high = (  # bigger value -> better rank
+        stats[HIGH_IS_BETTER]
+        .rank(ascending=False, na_option="bottom", method="max")
+    )
+    return pd.concat([ranks_low, ranks_high], axis=1)[STAT_COLUMNS]
+
+
+def batter_stats(events):
+    """
+    :param events: events DataFrame, as written by ingest.py
+    :return: DataFrame indexed by batter_name, with STAT_COLUMNS, their sums and their ranks (<stat>_rank)
+    """
+    return _finish(_counts(events))
+
+
+def append_events(stats, events):
+    """
+    Add new events to an existing stats table, without looking at the events it was built from.
+    :param stats: stats DataFrame from batter_stats
+    :param events: events which are not yet counted in stats
+    :return: updated stats DataFrame
+    """
+    counts = stats[COUNT_COLUMNS].add(_counts(events), fill_value=0)
+    return _finish(counts.astype({col: np.int64 for col in COUNT_COLUMNS if col != "xxBA_sum"}))
+
+
+def update_batter_stats(stats, events, batters):
+    """
+    Recompute stats for some batters only, keeping the counts of the other batters as they are.
+    :param stats: stats DataFrame from batter_stats
+    :param events: events DataFrame. only rows of the given batters are used
+    :param batters: names of batters whose events were added, changed or removed
+    :return: updated stats DataFrame
+    """
+    batters = set(batters)
+    updated = _counts(events[events.batter_name.isin(batters)])
+    kept = stats.loc[~stats.index.isin(batters), COUNT_COLUMNS]
+    return _finish(pd.concat([kept, updated]))
+
+
+def ranks(stats):
+    """ :return: rank of each batter in each of STAT_COLUMNS (1 is best), looked up from the stats table """
+    return stats[[f"{col}_rank" for col in STAT_COLUMNS]].rename(columns=lambda col: col[:-len("_rank")])
+
+
+def league_averages(stats):
+    """ :return: Series of the average of each of STAT_COLUMNS across batters """
+    return stats[STAT_COLUMNS].agg("mean")
+
+
+def save(stats, stats_path=STATS_PATH, league_path=LEAGUE_PATH):
+    """ write the stats table, and league averages next to it """
+    stats.to_csv(stats_path)
+    league_averages(stats).to_frame("league_average").to_csv(league_path, index_label="stat")
+
+
+def load(stats_path=STATS_PATH, league_path=LEAGUE_PATH):
+    """
+    Read a stats table written by save. Tables from before ranks were stored get them computed.
+    :return: (stats, ranks, league averages)
+    """
+    stats = pd.read_csv(stats_path, index_col="batter_name")
+    if not all(f"{col}_rank" in stats for col in STAT_COLUMNS):
+        stats = pd.concat([stats, _rank(stats).add_suffix("_rank")], axis=1)
+    if os.path.exists(league_path):
+        avgs = pd.read_csv(league_path, index_col="stat")["league_average"]
+    else:
+        avgs = league_averages(stats)
+    return stats[STAT_COLUMNS], ranks(stats), avgs
+
+
+def format_rank(rank):
+    match rank % 10:
+        case 1:
+            rank_repr = f"{rank:n}st"
+        case 2:
+            rank_repr = f"{rank:n}nd"
+        case _:
+            rank_repr = f"{rank:n}th"
+    return rank_repr
+
+
+def batter_table(batter, stats, ranks, avgs):
+    """
+    One batter's stats for display, as shown on the Player Profiles page
+    :param stats, ranks, avgs: as returned by load
+    :return: DataFrame with a row per stat (labelled by STAT_LABELS), and the batter's value, rank and league average
+    """
+    batter_stats = stats.loc[[batter]].transpose(copy=True)
+    batter_stats.insert(0, "Rank", ranks.loc[batter].apply(format_rank))
+    batter_stats["League Average"] = avgs
+    batter_stats.index = [STAT_LABELS[x] for x in batter_stats.index]
+    return batter_stats
+
+
+def angle_counts(stats):
+    """
+    :param stats: stats DataFrame from batter_stats, or as read from STATS_PATH
+    :return: dict of angle column -> DataFrame of histogram counts, indexed by batter_name with one column per bin.
+        the league's histogram is the sum over batters
+    """
+    return {col: stats[[f"{col}_{i}" for i in range(bins)]].set_axis(range(bins), axis=1)
+            for col, bins in ANGLE_BINS.items()}
+
+
+def load_angle_counts(stats_path=STATS_PATH):
+    """ :return: angle_counts of a stats table written by save """
+    return angle_counts(pd.read_csv(stats_path, index_col="batter_name", usecols=["batter_name"] + HISTOGRAM_COLUMNS))
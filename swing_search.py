@@ -0,0 +1,210 @@
+"""
+Search for swings with similar bat paths, over the tracking data of many pitches.
+
+Each swing's bat head and handle are resampled to a common time base: SAMPLES times evenly spaced over a window from
+BEFORE seconds before the hit to AFTER seconds after it. Paths are then moved so the handle is at the origin at the
+moment of contact, so swings are compared by their shape rather than where the batter stood. Swings whose bat
+tracking doesn't cover the whole window are left out.
+
+The resampled paths are compressed with PCA (an SVD of the centred paths) and the compressed vectors are kept in a
+KD-tree. A query takes a shortlist of nearest neighbours from the tree, and re-ranks it by the exact distance between
+the full paths: the root mean square distance between matching head and handle positions, in feet.
+
+Usage:
+    python swing_search.py build "data/WISD tracking" "data/WISD swings.npz"
+    python swing_search.py query "data/WISD swings.npz" <fileID> -k 10
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+import ragged
+import tracking_store
+
+INDEX_PATH = "data/WISD swings.npz"
+BEFORE = 0.1  # seconds of the swing before the hit
+AFTER = 0.05  # seconds after the hit
+SAMPLES = 31  # resampled times per swing
+COMPONENTS = 16  # dimensions of the compressed paths
+BODIES = ("head", "handle")
+
+
+def _resample(time, positions, offsets, queries):
+    """
+    Linearly interpolate many tracks at many times each.
+    :param time: (N,) sample times, sorted within each track
+    :param positions: (3, N) positions at each sample
+    :param offsets: (P+1,) track offsets
+    :param queries: (P, S) times to interpolate each track at
+    :return: (P, 3, S) positions. NaN at queries outside their track
+    """
+    n, samples = queries.shape
+    flat = queries.ravel()
+    idx = ragged.searchsorted(time, offsets, flat, np.arange(n + 1) * samples)
+    ids = np.repeat(np.arange(n), samples)
+    top = max(time.size - 1, 0)
+    start, stop = offsets[:-1][ids], offsets[1:][ids]
+    first, last = np.minimum(start, top), np.minimum(np.maximum(stop - 1, start), top)
+    hi = np.clip(idx, first, last)
+    lo = np.clip(idx - 1, first, last)
+    out = np.full((3, flat.size), np.nan)
+    if time.size:
+        inside = (stop > start) & (flat >= time[first]) & (flat <= time[last])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # clipped, since a query within rounding error of a sample time can be searched to either side of it
+            w = np.clip(np.where(hi > lo, (flat - time[lo]) / (time[hi] - time[lo]), 0.), 0, 1)
+        interpolated = (1 - w) * positions[:, lo] + w * positions[:, hi]  # exact at sample times
+        out[:, inside] = interpolated[:, inside]
+    return out.reshape(3, n, samples).transpose(1, 0, 2)
+
+
+def swing_paths(pitches, file_ids=None, before=BEFORE, after=AFTER, samples=SAMPLES):
+    """
+    Resample the bat paths of many swings around their hits, aligned in time and space (see the module docstring).
+    :param pitches: dict of fileID -> util.PitchFrames, or a tracking_store.TrackingStore. for a store, only the samples
+        around each hit are read
+    :param file_ids: fileIDs to use. defaults to all of pitches
+    :return: (fileIDs, (P, 2, 3, samples) head and handle positions). only swings with a hit time and bat tracking
+        over the whole window are included
+    """
+    times = np.linspace(-before, after, samples)
+    contact = int(np.argmin(np.abs(times)))
+    margin = (before + after) / (samples - 1)  # so samples just outside the window can be interpolated from
+
+    kept_ids, hit_times, tracks = [], [], {body: [] for body in BODIES}
+    for fileID in pitches if file_ids is None else file_ids:
+        if hasattr(pitches, "around_hit"):
+            if pitches.hit_time(fileID) is None:
+                continue
+            frames = pitches.around_hit(fileID, before + margin, after + margin)
+        else:
+            frames = pitches[fileID]
+        if frames.hit_time is None or not frames.has_bat():
+            continue
+        kept_ids.append(fileID)
+        hit_times.append(frames.hit_time)
+        for body in BODIES:
+            tracks[body].append(getattr(frames, body))
+
+    queries = np.add.outer(np.asarray(hit_times, dtype=float), times).reshape(-1, samples)
+    paths = np.empty((len(kept_ids), len(BODIES), 3, samples))
+    for b, body in enumerate(BODIES):
+        time, offsets = ragged.concat([track.time for track in tracks[body]])
+        positions, _ = ragged.concat([track.positions for track in tracks[body]])
+        if not kept_ids:
+            positions = np.empty((3, 0))
+        paths[:, b] = _resample(time, positions, offsets, queries)
+    paths -= paths[:, 1:2, :, contact:contact + 1]  # handle at contact is the origin
+
+    complete = ~np.isnan(paths).any(axis=(1, 2, 3))
+    return [fid for fid, keep in zip(kept_ids, complete) if keep], paths[complete]
+
+
+class SwingIndex:
+    """ nearest neighbour search over swing paths from swing_paths """
+
+    def __init__(self, file_ids, paths, before=BEFORE, after=AFTER, components=COMPONENTS):
+        """
+        :param file_ids: fileID of each swing
+        :param paths: (P, 2, 3, S) paths from swing_paths
+        :param before: window the paths were resampled over, for resampling query swings the same way
+        :param components: dimensions kept by PCA, for the KD-tree
+        """
+        self.file_ids = pd.Index(file_ids, dtype=str)
+        self.before, self.after = before, after
+        self.samples = paths.shape[-1]
+        self.vectors = paths.reshape(len(paths), len(BODIES) * 3 * self.samples)
+        if not len(paths):  # eg. no swing covers the whole window. every query finds nothing
+            self.mean = np.zeros(self.vectors.shape[1])
+            self.basis = np.zeros((self.vectors.shape[1], 0))
+            self.tree = None
+            return
+        self.mean = self.vectors.mean(axis=0)
+        _, _, vt = np.linalg.svd(self.vectors - self.mean, full_matrices=False)
+        self.basis = vt[:components].T  # (dimensions, components), orthonormal columns
+        self.tree = KDTree(self._compress(self.vectors))
+
+    def _compress(self, vectors):
+        return (vectors - self.mean) @ self.basis
+
+    def __len__(self):
+        return len(self.file_ids)
+
+    def query(self, path, k=10, candidates=None, exclude=None):
+        """
+        :param path: (2, 3, S) path of a swing, from swing_paths with this index's window
+        :param k: number of swings to return
+        :param candidates: size of the shortlist taken from the KD-tree and re-ranked exactly. defaults to 4k.
+            compressed distances never exceed exact ones, so a longer shortlist only makes misses less likely
+        :param exclude: fileID to leave out of the results, eg. the query swing itself
+        :return: Series of the exact RMS distance (feet) to the k nearest swings, indexed by fileID, nearest first
+        """
+        vector = np.asarray(path, dtype=float).reshape(1, -1)
+        if self.tree is None:
+            return pd.Series([], index=self.file_ids[:0], name="distance", dtype=float)
+        candidates = min(max(candidates or 4 * k, k + (exclude is not None)), len(self))
+        _, shortlist = self.tree.query(self._compress(vector), k=candidates)
+        shortlist = shortlist[0]
+        if exclude is not None:
+            shortlist = shortlist[self.file_ids[shortlist] != exclude]
+        distances = np.sqrt(np.mean((self.vectors[shortlist] - vector) ** 2, axis=1) * 3)  # per position
+        order = np.argsort(distances, kind="stable")[:k]
+        return pd.Series(distances[order], index=self.file_ids[shortlist[order]], name="distance")
+
+    def similar(self, fileID, k=10, candidates=None):
+        """ :return: query for a swing in the index, without the swing itself """
+        path = self.vectors[self.file_ids.get_loc(fileID)].reshape(len(BODIES), 3, self.samples)
+        return self.query(path, k, candidates, exclude=fileID)
+
+    def query_pitch(self, pitch_frames, k=10, candidates=None):
+        """ :return: query for a swing which isn't in the index. ValueError if it can't be resampled """
+        file_ids, paths = swing_paths({None: pitch_frames}, before=self.before, after=self.after,
+                                      samples=self.samples)
+        if not file_ids:
+            raise ValueError("pitch has no hit time, or no bat tracking over the whole window")
+        return self.query(paths[0], k, candidates)
+
+    @staticmethod
+    def build(pitches, file_ids=None, before=BEFORE, after=AFTER, samples=SAMPLES, components=COMPONENTS):
+        """ :return: SwingIndex over the swings of pitches. see swing_paths """
+        kept, paths = swing_paths(pitches, file_ids, before, after, samples)
+        return SwingIndex(kept, paths, before, after, components)
+
+    def save(self, path=INDEX_PATH):
+        np.savez_compressed(path, file_ids=np.array(self.file_ids, dtype=str), window=[self.before, self.after],
+                            components=self.basis.shape[1],
+                            paths=self.vectors.reshape(len(self), len(BODIES), 3, self.samples))
+
+    @staticmethod
+    def load(path=INDEX_PATH):
+        with np.load(path) as f:
+            before, after = f["window"]
+            return SwingIndex(f["file_ids"], f["paths"], float(before), float(after), int(f["components"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="index the swings of a tracking store")
+    build.add_argument("store_path")
+    build.add_argument("index_path", nargs="?", default=INDEX_PATH)
+    build.add_argument("--components", type=int, default=COMPONENTS)
+    query = commands.add_parser("query", help="list the swings most similar to one in the index")
+    query.add_argument("index_path")
+    query.add_argument("file_id")
+    query.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        index = SwingIndex.build(tracking_store.TrackingStore(args.store_path), components=args.components)
+        index.save(args.index_path)
+        print(f"indexed {len(index)} swings to {args.index_path}")
+    elif args.command == "query":
+        print(SwingIndex.load(args.index_path).similar(args.file_id, args.k).to_string())
+
+
+if __name__ == "__main__":
+    main()
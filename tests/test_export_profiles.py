@@ -0,0 +1,63 @@
+import os
+
+import pandas as pd
+import pytest
+
+import export_profiles
+import ingest
+from benchmarks import synthetic
+from benchmarks.suite import ingest_paths, synthetic_xxba
+
+
+@pytest.fixture
+def tables(tmp_path):
+    raw_dir = str(tmp_path / "raw")
+    synthetic.write_files(raw_dir, pitches=30, ball_rate=100, bat_rate=100, batters=3, seed=2)
+    xxba_path = str(tmp_path / "xxba_grid.npz")
+    synthetic_xxba().save(xxba_path)
+    paths = ingest_paths(str(tmp_path), "tables")
+    ingest.run(raw_dir, xxba_path=xxba_path, workers=0, **paths)
+    return paths
+
+
+def export(tables, out_dir, force=False):
+    return export_profiles.export(out_dir, tables["events_path"], tables["stats_path"], tables["league_path"],
+                                  workers=0, force=force)
+
+
+def figure_times(out_dir, dirs):
+    """ :return: dict of (batter, figure name) -> modification time of the figure's file """
+    return {(batter, name): os.stat(os.path.join(out_dir, d, f"{name}.png")).st_mtime_ns
+            for batter, d in dirs.items() for name in export_profiles.FIGURES}
+
+
+def test_export_only_renders_changed_figures(tables, tmp_path):
+    out_dir = str(tmp_path / "profiles")
+    n_batters, n_rendered = export(tables, out_dir)
+    assert n_batters == n_rendered > 1
+    assert export(tables, out_dir) == (n_batters, 0)  # nothing changed
+
+    # one batter's exit velocities change, and with them the league's
+    events = pd.read_csv(tables["events_path"])
+    changed = events.batter_name[events.parse_error.isna()].dropna().iloc[0]
+    events.loc[events.batter_name == changed, "exit_velocity"] += 5
+    events.to_csv(tables["events_path"], index=False)
+    dirs = export_profiles.batter_dirs(events.batter_name[events.parse_error.isna()].dropna().unique())
+    for path in [os.path.join(out_dir, d, f"{name}.png") for d in dirs.values() for name in export_profiles.FIGURES]:
+        os.utime(path, ns=(0, 0))
+
+    assert export(tables, out_dir) == (n_batters, n_batters)
+    rendered = {key for key, mtime in figure_times(out_dir, dirs).items() if mtime}
+    assert rendered == {(batter, name) for batter in dirs for name in export_profiles.FIGURES
+                        if batter == changed or name == "exit_velocity"}
+
+    assert export(tables, out_dir, force=True) == (n_batters, n_batters)
+
+
+def test_batter_dirs_are_unique():
+    batters = ["A. B", "A B", "a b", "League", "Ohtani, Shohei", "?!", "..."]
+    dirs = export_profiles.batter_dirs(batters)
+    assert len({name.lower() for name in dirs.values()} | {export_profiles.LEAGUE_DIR}) == len(batters) + 1
+    assert all(dirs.values())
+    assert dirs["Ohtani, Shohei"] == "Ohtani_Shohei"
+    assert dirs == export_profiles.batter_dirs(reversed(batters))  # doesn't depend on order
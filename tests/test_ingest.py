@@ -0,0 +1,79 @@
+import os
+
+import pandas as pd
+import pytest
+
+import ingest
+import manifest
+import tracking_store
+from benchmarks import synthetic
+from benchmarks.suite import ingest_paths, synthetic_xxba
+
+
+@pytest.fixture
+def raw(tmp_path):
+    raw_dir = str(tmp_path / "raw")
+    synthetic.write_files(raw_dir, pitches=40, ball_rate=100, bat_rate=100, seed=1)
+    xxba_path = str(tmp_path / "xxba_grid.npz")
+    synthetic_xxba().save(xxba_path)
+    return raw_dir, xxba_path
+
+
+def run(raw, paths, incremental):
+    raw_dir, xxba_path = raw
+    return ingest.run(raw_dir, xxba_path=xxba_path, workers=0, incremental=incremental, **paths)
+
+
+def test_incremental_without_manifest_rebuilds(raw, tmp_path):
+    paths = ingest_paths(str(tmp_path), "tables")
+    run(raw, paths, incremental=False)
+    events = pd.read_csv(paths["events_path"])
+    stats = pd.read_csv(paths["stats_path"], index_col="batter_name")
+
+    os.remove(paths["manifest_path"])
+    run(raw, paths, incremental=True)
+    rerun_events = pd.read_csv(paths["events_path"])
+    assert not rerun_events.fileID.duplicated().any()
+    pd.testing.assert_frame_equal(rerun_events, events)
+    pd.testing.assert_frame_equal(pd.read_csv(paths["stats_path"], index_col="batter_name"), stats)
+
+
+def test_incremental_without_file_ids_rebuilds(raw, tmp_path):
+    paths = ingest_paths(str(tmp_path), "tables")
+    run(raw, paths, incremental=False)
+    events = pd.read_csv(paths["events_path"])
+    stats = pd.read_csv(paths["stats_path"], index_col="batter_name")
+
+    # events table written before fileIDs were stored, with a manifest of the same files
+    events.drop(columns="fileID").to_csv(paths["events_path"], index=False)
+    run(raw, paths, incremental=True)
+    pd.testing.assert_frame_equal(pd.read_csv(paths["events_path"]), events)
+    pd.testing.assert_frame_equal(pd.read_csv(paths["stats_path"], index_col="batter_name"), stats)
+
+
+def test_incremental_with_manifest_parses_nothing(raw, tmp_path):
+    paths = ingest_paths(str(tmp_path), "tables")
+    run(raw, paths, incremental=False)
+    events = pd.read_csv(paths["events_path"])
+    assert run(raw, paths, incremental=True) == 0
+    pd.testing.assert_frame_equal(pd.read_csv(paths["events_path"]), events)
+
+
+def test_tracking_store_holds_every_pitch(raw, tmp_path):
+    paths = ingest_paths(str(tmp_path), "tables")
+    tracking_path = str(tmp_path / "tracking")
+    ingest.run(raw[0], xxba_path=raw[1], workers=0, tracking_path=tracking_path, **paths)
+    events = pd.read_csv(paths["events_path"], dtype={"fileID": str})
+    store = tracking_store.TrackingStore(tracking_path)
+    file_ids = {manifest.file_id(path) for path in ingest.list_raw_files(raw[0])}
+    assert set(store) == file_ids
+    assert set(events.fileID) < file_ids  # some pitches have no hit, so no row
+
+
+def test_incremental_without_tracking_store_rebuilds(raw, tmp_path):
+    paths = ingest_paths(str(tmp_path), "tables")
+    run(raw, paths, incremental=False)
+    tracking_path = str(tmp_path / "tracking")
+    n_rows = ingest.run(raw[0], xxba_path=raw[1], workers=0, incremental=True, tracking_path=tracking_path, **paths)
+    assert n_rows == len(pd.read_csv(paths["events_path"]))
+    assert len(tracking_store.TrackingStore(tracking_path)) == len(ingest.list_raw_files(raw[0]))
@@ -0,0 +1,26 @@
+import json
+
+import instrument
+
+
+def test_nested_regions_and_stage_memory(tmp_path, monkeypatch):
+    out = tmp_path / "profile.jsonl"
+    monkeypatch.setattr(instrument, "_target", str(out))
+    instrument.begin_run("page")
+    instrument.region("Outer")
+    instrument.region("Outer/first")
+    with instrument.stage("allocate"):
+        block = bytearray(32 * 2 ** 20)
+        block[::4096] = b"x" * len(block[::4096])  # touch every page, so it is resident
+    instrument.region("Outer/second")
+    instrument.region("After")
+    instrument.end_run()
+    del block
+
+    summary = json.loads(out.read_text())
+    stages = summary["stages"]
+    assert set(stages) == {"Outer", "Outer/first", "Outer/second", "After", "allocate"}
+    assert stages["Outer"]["seconds"] >= stages["Outer/first"]["seconds"] + stages["Outer/second"]["seconds"]
+    if "start_rss_mib" in summary:  # only where RSS can be read
+        assert stages["allocate"]["rss_growth_mib"] > 16
+        assert stages["Outer"]["rss_growth_mib"] >= stages["allocate"]["rss_growth_mib"]
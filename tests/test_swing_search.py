@@ -0,0 +1,13 @@
+import numpy as np
+
+import swing_search
+
+
+def test_empty_index(tmp_path):
+    index = swing_search.SwingIndex.build({})
+    assert len(index) == 0
+    assert index.query(np.zeros((len(swing_search.BODIES), 3, index.samples)), k=3).empty
+
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+    assert len(swing_search.SwingIndex.load(path)) == 0
@@ -0,0 +1,215 @@
+"""
+On-disk store of tracking data for many pitches, replacing the WISD tracking pickle.
+
+A store is a directory holding
+- values.bin: every sample of every track, as rows of float64 in TRACK_COLUMNS order (see util.py)
+- index.npz: fileIDs, the [start, stop) rows of each pitch's ball/head/handle tracks, and hit times
+
+values.bin is memory-mapped, so opening a store only reads the index, and reading a pitch only touches its own rows.
+
+Usage:
+    python tracking_store.py convert "data/WISD tracking.pickle" "data/WISD tracking"
+    python tracking_store.py render "data/WISD tracking" "private/swings" [fileID ...]
+"""
+
+import argparse
+import os
+import pickle
+
+import numpy as np
+
+from util import PitchFrames, Track, TRACK_COLUMNS, render_swings
+
+BODIES = ("ball", "head", "handle")
+STORE_PATH = "data/WISD tracking"
+
+_VALUES = "values.bin"
+_INDEX = "index.npz"
+
+
+def exists(path=STORE_PATH):
+    """ :return: whether there is a (closed) tracking store at path """
+    return os.path.exists(os.path.join(path, _INDEX))
+
+
+class TrackingStoreWriter:
+    """
+    Writes PitchFrames to a tracking store, one pitch at a time. Use as a context manager, or call close().
+    Adding a fileID which is already in the store replaces it (the old rows stay in values.bin, but are unused).
+    """
+
+    def __init__(self, path=STORE_PATH, append=False):
+        """
+        :param path: store directory
+        :param append: add to an existing store, instead of starting a new one
+        """
+        if append and not exists(path):
+            raise FileNotFoundError(f"no tracking store at {path} to append to")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._rows = {}  # fileID -> (starts, stops, hit_time)
+        self._n_rows = 0
+        if append:
+            with np.load(os.path.join(path, _INDEX)) as index:
+                for fid, starts, stops, hit_time in zip(index["file_ids"], index["starts"], index["stops"],
+                                                        index["hit_time"]):
+                    self._rows[str(fid)] = (starts, stops, hit_time)
+                self._n_rows = int(index["n_rows"])
+        self._values = open(os.path.join(path, _VALUES), "ab" if append else "wb")
+        self._values.truncate(self._n_rows * len(TRACK_COLUMNS) * 8)  # drop anything written after the last close
+        self._values.seek(0, os.SEEK_END)
+
+    def add(self, fileID, pitch_frames):
+        """ store the tracks of one pitch. bodies without tracking (eg. no bat) are stored as empty tracks """
+        starts = np.empty(len(BODIES), dtype=np.int64)
+        stops = np.empty(len(BODIES), dtype=np.int64)
+        for i, body in enumerate(BODIES):
+            track = getattr(pitch_frames, body)
+            data = np.empty((len(TRACK_COLUMNS), 0)) if track is None else track.data
+            self._values.write(np.ascontiguousarray(data.T, dtype=np.float64).tobytes())
+            starts[i] = self._n_rows
+            self._n_rows += data.shape[1]
+            stops[i] = self._n_rows
+        hit_time = np.nan if pitch_frames.hit_time is None else pitch_frames.hit_time
+        self._rows[fileID] = (starts, stops, hit_time)
+
+    def remove(self, fileID):
+        """ remove a pitch from the index, if it is there """
+        self._rows.pop(fileID, None)
+
+    def close(self):
+        self._values.close()
+        file_ids = list(self._rows)
+        rows = list(self._rows.values())
+        index_path = os.path.join(self.path, _INDEX)
+        with open(index_path + ".tmp", "wb") as f:
+            np.savez(f,
+                     file_ids=np.array(file_ids, dtype=str),
+                     starts=np.array([r[0] for r in rows], dtype=np.int64).reshape(-1, len(BODIES)),
+                     stops=np.array([r[1] for r in rows], dtype=np.int64).reshape(-1, len(BODIES)),
+                     hit_time=np.array([r[2] for r in rows], dtype=float),
+                     n_rows=self._n_rows)
+        os.replace(index_path + ".tmp", index_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrackingStore:
+    """
+    Read-only, memory-mapped view of a tracking store. Behaves like a dict of fileID -> PitchFrames.
+    Tracks returned by the store are views into the memory map, so only the rows which are used get read from disk.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        with np.load(os.path.join(path, _INDEX)) as index:
+            self._file_ids = index["file_ids"]
+            self._starts = index["starts"]
+            self._stops = index["stops"]
+            self._hit_time = index["hit_time"]
+            n_rows = int(index["n_rows"])
+        self._lookup = {str(fid): i for i, fid in enumerate(self._file_ids)}
+        if n_rows:
+            self._values = np.memmap(os.path.join(path, _VALUES), dtype=np.float64, mode="r",
+                                     shape=(n_rows, len(TRACK_COLUMNS)))
+        else:
+            self._values = np.empty((0, len(TRACK_COLUMNS)))
+
+    def __len__(self):
+        return len(self._lookup)
+
+    def __contains__(self, fileID):
+        return fileID in self._lookup
+
+    def __iter__(self):
+        return iter(self._lookup)
+
+    def keys(self):
+        return self._lookup.keys()
+
+    def hit_time(self, fileID):
+        """ :return: hit time of the pitch, or None if it has no hit event """
+        hit_time = self._hit_time[self._lookup[fileID]]
+        return None if np.isnan(hit_time) else float(hit_time)
+
+    def track(self, fileID, body, start=None, end=None):
+        """
+        :param body: one of BODIES
+        :param start: only include samples at or after this time
+        :param end: only include samples before this time
+        :return: Track, or None if the pitch has no tracking for body
+        """
+        i = self._lookup[fileID]
+        b = BODIES.index(body)
+        lo, hi = self._starts[i, b], self._stops[i, b]
+        if hi == lo and body != "ball":
+            return None
+        track = Track(self._values[lo:hi].T)
+        if start is not None or end is not None:
+            first, last = np.searchsorted(track.time, [-np.inf if start is None else start,
+                                                       np.inf if end is None else end])
+            track = track[first:last]
+        return track
+
+    def __getitem__(self, fileID):
+        """ :return: PitchFrames of the pitch """
+        return self.window(fileID)
+
+    def get(self, fileID, default=None):
+        return self[fileID] if fileID in self else default
+
+    def window(self, fileID, start=None, end=None):
+        """ :return: PitchFrames holding only the samples in [start, end) """
+        head, handle = (self.track(fileID, body, start, end) for body in ("head", "handle"))
+        return PitchFrames(self.track(fileID, "ball", start, end), head, handle, self.hit_time(fileID))
+
+    def around_hit(self, fileID, before, after):
+        """ :return: PitchFrames holding only the samples within [hit_time - before, hit_time + after) """
+        hit_time = self.hit_time(fileID)
+        if hit_time is None:
+            raise ValueError(f"pitch {fileID} has no hit time")
+        return self.window(fileID, hit_time - before, hit_time + after)
+
+
+def convert_pickle(pickle_path, store_path=STORE_PATH):
+    """ convert an old tracking pickle (dict of fileID -> PitchFrames, with lists of Frames or Tracks) to a store """
+    with open(pickle_path, "rb") as f:
+        tracking_frames = pickle.load(f)
+
+    def as_track(frames):
+        return frames if frames is None or isinstance(frames, Track) else Track.from_frames(frames)
+
+    with TrackingStoreWriter(store_path) as writer:
+        for fileID, frames in tracking_frames.items():
+            writer.add(fileID, PitchFrames(as_track(frames.ball), as_track(frames.head), as_track(frames.handle),
+                                           frames.hit_time))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert = commands.add_parser("convert", help="convert a tracking pickle into a store")
+    convert.add_argument("pickle_path")
+    convert.add_argument("store_path", nargs="?", default=STORE_PATH)
+    render = commands.add_parser("render", help="draw swings to image files, see util.visualize_swing")
+    render.add_argument("store_path")
+    render.add_argument("out_dir")
+    render.add_argument("file_ids", nargs="*", help="pitches to draw. defaults to every pitch with a hit")
+    render.add_argument("--format", default="png", help="image format, eg. png or svg")
+    render.add_argument("--dpi", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        convert_pickle(args.pickle_path, args.store_path)
+    elif args.command == "render":
+        paths = render_swings(TrackingStore(args.store_path), args.out_dir, args.file_ids or None, args.format,
+                              args.dpi)
+        print(f"wrote {len(paths)} images to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
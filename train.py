@@ -0,0 +1,142 @@
+"""
+Train the xxBA and xBA models from a Statcast swings export, without loading the whole export into memory.
+Originally done by hand in KNN xBA.ipynb
+
+The CSV is streamed in chunks, reading only the needed columns with compact dtypes. Each chunk is filtered and
+deduplicated as it arrives (if the export identifies pitches), and both models are fitted from the one pass. Models
+are written to a versioned directory along with their metadata, and optionally installed where ingest.py looks for
+them.
+
+Usage:
+    python train.py data/mlb-all-swings-no-bunts.csv --install
+"""
+
+import argparse
+import json
+import os
+import pickle
+import shutil
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KNeighborsRegressor as KNN
+
+import xxba
+
+SWINGS_PATH = "data/mlb-all-swings-no-bunts.csv"
+MODELS_DIR = "models"
+XXBA_NEIGHBOURS = 20
+XBA_NEIGHBOURS = 50
+
+COLUMNS = {
+    "launch_speed": "float32",
+    "launch_angle": "float32",
+    "estimated_ba_using_speedangle": "float32",
+    "events": "str",
+}
+# identifies a pitch, for removing duplicates when exports overlap. exports without all of these columns aren't
+# deduplicated, since two different swings can have the same values
+KEY_COLUMNS = {"game_pk": "int64", "at_bat_number": "int64", "pitch_number": "int64"}
+HIT_EVENTS = ["single", "double", "triple", "home_run"]
+
+
+def read_swings(path=SWINGS_PATH, chunksize=500_000):
+    """
+    Stream the swings CSV and keep what the models need.
+    :return: DataFrame with exit_velocity, launch_angle, estimated_ba_using_speedangle and is_hit columns,
+        and the number of rows read
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    keys = list(KEY_COLUMNS) if set(KEY_COLUMNS) <= set(header) else []
+    dtypes = {**COLUMNS, **{col: KEY_COLUMNS[col] for col in keys}}
+
+    seen = set()
+    parts = []
+    n_read = 0
+    for chunk in pd.read_csv(path, usecols=list(dtypes), dtype=dtypes, chunksize=chunksize):
+        n_read += len(chunk)
+        chunk = chunk[chunk.launch_speed.notna()]  # remove missed swings
+        chunk = chunk[chunk.events != "catcher_interf"]  # there are very few of these, but we should remove them
+
+        if keys:  # drop pitches seen in this chunk or an earlier one
+            key = pd.util.hash_pandas_object(chunk[keys], index=False).to_numpy()
+            new = ~pd.Series(key).duplicated().to_numpy() & np.array([k not in seen for k in key.tolist()], dtype=bool)
+            seen.update(key[new].tolist())
+            chunk = chunk[new]
+
+        parts.append(pd.DataFrame({
+            "exit_velocity": chunk.launch_speed,
+            "launch_angle": chunk.launch_angle,
+            "estimated_ba_using_speedangle": chunk.estimated_ba_using_speedangle,
+            "is_hit": chunk.events.isin(HIT_EVENTS),
+        }))
+    swings = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(
+        columns=["exit_velocity", "launch_angle", "estimated_ba_using_speedangle", "is_hit"])
+    return swings, n_read
+
+
+def fit_models(swings, xxba_neighbours=XXBA_NEIGHBOURS, xba_neighbours=XBA_NEIGHBOURS):
+    """
+    :return: (xxba, xba). both are trained on swings which have a Statcast xBA, like in the notebook.
+        xxba fits Statcast's xBA; xba fits whether the ball went for a hit
+    """
+    training = swings[swings.estimated_ba_using_speedangle.notna()]
+    exit_launch = training[xxba.FEATURES]
+    xxba_model = KNN(xxba_neighbours).fit(exit_launch, training[["estimated_ba_using_speedangle"]])
+    xba_model = KNN(xba_neighbours).fit(exit_launch, training.is_hit)
+    return xxba_model, xba_model
+
+
+def save_models(xxba_model, xba_model, metadata, models_dir=MODELS_DIR, version=None):
+    """
+    Write both models, the xxBA grid model and metadata.json to models_dir/<version>/
+    :param version: defaults to the current UTC time
+    :return: directory the models were written to
+    """
+    version = version or datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    out_dir = os.path.join(models_dir, version)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, xxba.PICKLE_PATH), "wb") as f:
+        pickle.dump(xxba_model, f)
+    with open(os.path.join(out_dir, "xba.pickle"), "wb") as f:
+        pickle.dump(xba_model, f)
+    xxba.GridModel.from_model(xxba_model).save(os.path.join(out_dir, xxba.GRID_PATH))
+    with open(os.path.join(out_dir, "metadata.json"), "w") as f:
+        json.dump({"version": version, **metadata}, f, indent=1)
+    return out_dir
+
+
+def install(model_dir):
+    """ copy the xxBA models from a version directory to the paths ingest.py loads them from """
+    for name in (xxba.PICKLE_PATH, xxba.GRID_PATH):
+        shutil.copyfile(os.path.join(model_dir, name), name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("swings_csv", nargs="?", default=SWINGS_PATH)
+    parser.add_argument("--models-dir", default=MODELS_DIR, help="where to write versioned models")
+    parser.add_argument("--chunksize", type=int, default=500_000, help="CSV rows read at a time")
+    parser.add_argument("--install", action="store_true", help="also copy the new xxBA models for ingest.py to use")
+    args = parser.parse_args()
+
+    swings, n_read = read_swings(args.swings_csv, args.chunksize)
+    xxba_model, xba_model = fit_models(swings)
+    metadata = {
+        "trained": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "source": os.path.abspath(args.swings_csv),
+        "rows_read": n_read,
+        "rows_kept": len(swings),
+        "training_rows": int(swings.estimated_ba_using_speedangle.notna().sum()),
+        "xxba_neighbours": XXBA_NEIGHBOURS,
+        "xba_neighbours": XBA_NEIGHBOURS,
+    }
+    out_dir = save_models(xxba_model, xba_model, metadata, args.models_dir)
+    if args.install:
+        install(out_dir)
+    print(f"wrote models to {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
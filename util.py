@@ -4,10 +4,18 @@ For data structures and useful functions
 
 from dataclasses import dataclass
 from typing import List, Optional
+import math
+import os
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
 from numpy.polynomial import Polynomial
 
+import contact
+import instrument
+import kinematics
+
 
 @dataclass
 class Frame:
@@ -20,9 +28,124 @@ class Frame:
     vy: Optional[float] = None
     vz: Optional[float] = None
 
+
+# attributes of a Frame, in the order they are stored in a Track
+TRACK_COLUMNS = ("time", "x", "y", "z", "speed", "vx", "vy", "vz")
+
+
+def _optional(value):
+    """ NaN marks a missing value in a Track, but None marks it in a Frame """
+    return None if math.isnan(value) else float(value)
+
+
+@dataclass(eq=False)
+class Track:
+    """
+    Columnar tracking data for a single body (ball, bat head or bat handle).
+
+    All samples live in one contiguous (8, n) float array, with one row per Frame attribute (see TRACK_COLUMNS).
+    Missing values (eg. velocity near the ends of the track) are NaN.
+    Indexing or iterating a Track gives Frame objects, for code which still expects a list of Frames.
+    """
+    data: np.ndarray
+
+    @staticmethod
+    def from_samples(time, pos):
+        """
+        Build a Track from sample times and positions. Velocity columns are left as NaN.
+        :param time: sequence of n sample times
+        :param pos: sequence of n [x, y, z] positions
+        :return: Track
+        """
+        time = np.asarray(time, dtype=float)
+        data = np.full((len(TRACK_COLUMNS), time.size), np.nan)
+        data[0] = time
+        if time.size:
+            data[1:4] = np.asarray(pos, dtype=float).T
+        return Track(data)
+
+    @staticmethod
+    def from_frames(frames: List[Frame]):
+        """ Build a Track from a list of Frames, eg. from an old tracking pickle """
+        data = np.array([[getattr(f, col) for col in TRACK_COLUMNS] for f in frames], dtype=float)
+        return Track(data.T.reshape(len(TRACK_COLUMNS), len(frames)).copy())
+
+    @property
+    def time(self):
+        return self.data[0]
+
+    @property
+    def x(self):
+        return self.data[1]
+
+    @property
+    def y(self):
+        return self.data[2]
+
+    @property
+    def z(self):
+        return self.data[3]
+
+    @property
+    def speed(self):
+        return self.data[4]
+
+    @property
+    def vx(self):
+        return self.data[5]
+
+    @property
+    def vy(self):
+        return self.data[6]
+
+    @property
+    def vz(self):
+        return self.data[7]
+
+    @property
+    def positions(self):
+        """ (3, n) view of the x, y, z rows """
+        return self.data[1:4]
+
+    @property
+    def velocity(self):
+        """ (3, n) view of the vx, vy, vz rows """
+        return self.data[5:8]
+
+    def __len__(self):
+        return self.data.shape[1]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return Track(self.data[:, i])
+        time, x, y, z, speed, vx, vy, vz = self.data[:, i]
+        return Frame(float(time), float(x), float(y), float(z),
+                     _optional(speed), _optional(vx), _optional(vy), _optional(vz))
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def frames(self):
+        """ :return: List[Frame]. compatibility view of this Track """
+        return list(self)
+
+    def between(self, start, end):
+        """
+        Samples strictly between start and end, found by binary search, so the track must be sorted by time.
+        :return: Track, a view of this one
+        """
+        first = np.searchsorted(self.time, start, side="right")
+        last = np.searchsorted(self.time, end, side="left")
+        return self[first:max(first, last)]
+
+
+def _as_track(frames):
+    return frames if frames is None or isinstance(frames, Track) else Track.from_frames(frames)
+
+
 def visualize_swing(ax, frames, bat_buffer=0.07, ball_buffer=0.3):
     """ Visualize moments before/after the bat and ball make contact (or closest approach).
-    :param fig: MatplotLib figure to render on
+    :param ax: MatplotLib 3D axes to render on
     :param frames: PitchFrames w/ data for bat and ball
     :param bat_buffer: how many seconds before/after contact to display. default=0.07
     :param ball_buffer: how many seconds before/after contact to display. default=0.3
@@ -33,28 +156,56 @@ def visualize_swing(ax, frames, bat_buffer=0.07, ball_buffer=0.3):
     t_contact = frames.hit_time
 
     # get frames near time of contact
-    ball_x, ball_y, ball_z, ball_time = extract_coords_from_frames(frames.ball, start=t_contact - ball_buffer,
-                                                                   end=t_contact + ball_buffer)
-    head_x, head_y, head_z, head_time = extract_coords_from_frames(frames.head, start=t_contact - bat_buffer,
-                                                                   end=t_contact + bat_buffer)
-    handle_x, handle_y, handle_z, _ = extract_coords_from_frames(frames.handle, start=t_contact - bat_buffer,
-                                                                 end=t_contact + bat_buffer)
+    ball = _as_track(frames.ball).between(t_contact - ball_buffer, t_contact + ball_buffer)
 
     # draw ball
-    ax.scatter(ball_x, ball_y, ball_z, c=ball_time, cmap=plt.colormaps['inferno'])
-
-    # draw bat
-    cmap = plt.colormaps['inferno'].resampled(len(head_time))
-    for i in range(len(head_time)):
-        x = [head_x[i], handle_x[i]]
-        y = [head_y[i], handle_y[i]]
-        z = [head_z[i], handle_z[i]]
-        ax.plot(x, y, z, c=cmap(i))
-    plt.xlabel("x")
-    plt.ylabel("y")
+    ax.scatter(ball.x, ball.y, ball.z, c=ball.time, cmap=plt.colormaps['inferno'])
+
+    # draw bat, as one line per sample coloured by time, all in a single artist
+    if frames.head is not None and frames.handle is not None:
+        head = _as_track(frames.head).between(t_contact - bat_buffer, t_contact + bat_buffer)
+        handle = _as_track(frames.handle).between(t_contact - bat_buffer, t_contact + bat_buffer)
+        n = min(len(head), len(handle))
+        segments = np.stack([head.positions[:, :n].T, handle.positions[:, :n].T], axis=1)  # (n, 2, 3)
+        colours = plt.colormaps['inferno'](np.linspace(0, 1, n))
+        ax.add_collection3d(Line3DCollection(segments, colors=colours))
+        ax.auto_scale_xyz(segments[..., 0], segments[..., 1], segments[..., 2], had_data=True)
+    ax.set_xlabel("x")
+    ax.set_ylabel("y")
     set_axes_equal(ax)
 
 
+def render_swings(pitches, out_dir, file_ids=None, fmt="png", dpi=100, bat_buffer=0.07, ball_buffer=0.3):
+    """
+    Draw many swings with visualize_swing, one image file each (<out_dir>/<fileID>.<fmt>).
+    Pitches without a hit time are skipped.
+    :param pitches: dict of fileID -> PitchFrames, or a tracking_store.TrackingStore. for a store, only the samples
+        around each hit are read
+    :param out_dir: directory to write images to
+    :param file_ids: fileIDs to draw. defaults to all of pitches
+    :param fmt: image format, eg. "png" or "svg"
+    :return: list of paths written
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    fig = Figure()  # reused for every swing. Figure, rather than pyplot, so nothing is kept open
+    paths = []
+    for fileID in pitches if file_ids is None else file_ids:
+        if hasattr(pitches, "around_hit"):
+            if pitches.hit_time(fileID) is None:
+                continue
+            frames = pitches.around_hit(fileID, ball_buffer, ball_buffer)
+        else:
+            frames = pitches[fileID]
+            if frames.hit_time is None:
+                continue
+        fig.clear()
+        visualize_swing(fig.add_subplot(projection="3d"), frames, bat_buffer, ball_buffer)
+        path = os.path.join(out_dir, f"{fileID}.{fmt}")
+        fig.savefig(path, dpi=dpi)
+        paths.append(path)
+    return paths
+
+
 def set_axes_equal(ax):
     """
     Make axes of 3D plot have equal scale so that spheres appear as spheres,
@@ -86,41 +237,28 @@ def set_axes_equal(ax):
 def time_of_contact(head_frames, handle_frames, ball_frames):
     """ return time at which the ball and bat are closest to each other.
     Not actually required, since the bat tracking data has the time of hits - oops!
-    :param head_frames: List[Frame]. tracking data for bat head
-    :param handle_frames: List[Frame]. tracking data for bat handle.
-    :param ball_frames: List[Frame]. tracking data for ball
+    Useful for pitches where the Hit event is missing or untrustworthy though.
+    Interpolates between frames, so the result need not be one of the sample times. See contact.py
+    :param head_frames: Track or List[Frame]. tracking data for bat head
+    :param handle_frames: Track or List[Frame]. tracking data for bat handle.
+    :param ball_frames: Track or List[Frame]. tracking data for ball
+    :return: float, or None if ball and bat tracking don't overlap in time
     """
-    best_dist = np.Infinity  # closest distance between bat and ball
-    t_0 = None
-    for ball in ball_frames:
-        # find the index of head frame which is closest in time to the ball frame.
-        # can use the index to get the position of both the head and handle, since they have the same time data
-        idx = min(range(len(head_frames)), key=lambda i: abs(head_frames[i].time - ball.time))
-        head = head_frames[idx]
-        handle = handle_frames[idx]
-
-        # calculate the distance between the ball and bat, using the line defined by the head and handle
-        # lin alg explained here: https://mathworld.wolfram.com/Point-LineDistance3-Dimensional.html
-        head_pos = np.array([head.x, head.y, head.z])
-        handle_pos = np.array([handle.x, handle.y, handle.z])
-        ball_pos = np.array([ball.x, ball.y, ball.z])
-
-        v1 = np.cross(ball_pos - handle_pos,
-                      ball_pos - head_pos)  # area vector for 2x the triangle defined by the 3 points
-        v2 = handle_pos - head_pos  # base of triangle
-        dist = np.dot(v1, v1) / np.dot(v2, v2)
-
-        if dist < best_dist:
-            best_dist = dist
-            t_0 = head.time
-    return t_0
+    head, handle, ball = (f if isinstance(f, Track) else Track.from_frames(f)
+                          for f in (head_frames, handle_frames, ball_frames))
+    t_0 = contact.batch_contact(head.time, head.positions, handle.positions, [0, len(head)],
+                                ball.time, ball.positions, [0, len(ball)]).time[0]
+    return None if np.isnan(t_0) else float(t_0)
 
 
 def extract_coords_from_frames(frames: List[Frame], start=-999, end=999):
     """
-    Takes a list of frames, returns vectors corresponding to each coordinate.
+    Takes a list of frames (or a Track), returns vectors corresponding to each coordinate.
     set start and end to only consider frames within a certain time window
     """
+    if isinstance(frames, Track):
+        frames = frames.between(start, end)
+        return frames.x, frames.y, frames.z, frames.time
     x = [f.x for f in frames if start < f.time < end]
     y = [f.y for f in frames if start < f.time < end]
     z = [f.z for f in frames if start < f.time < end]
@@ -130,9 +268,9 @@ def extract_coords_from_frames(frames: List[Frame], start=-999, end=999):
 
 @dataclass
 class PitchFrames:
-    ball: List[Frame]
-    head: List[Frame]
-    handle: List[Frame]
+    ball: Track
+    head: Optional[Track]
+    handle: Optional[Track]
     hit_time: float
 
     def has_bat(self):
@@ -148,23 +286,25 @@ class PitchFrames:
         """
 
         # ball
-        ball_frames = [Frame(s["time"], *s["pos"]) for s in samples_ball]
+        ball_frames = Track.from_samples([s["time"] for s in samples_ball], [s["pos"] for s in samples_ball])
 
         # bat
         if samples_bat is None or samples_bat[0]["event"] == "No":
             head_frames = None
             handle_frames = None
         else:
-            # create Frame objects
-            head_frames = [Frame(s["time"], *(s["head"]["pos"])) for s in samples_bat]
-            handle_frames = [Frame(s["time"], *(s["handle"]["pos"])) for s in samples_bat]
+            # head and handle share the same sample times
+            bat_time = [s["time"] for s in samples_bat]
+            head_frames = Track.from_samples(bat_time, [s["head"]["pos"] for s in samples_bat])
+            handle_frames = Track.from_samples(bat_time, [s["handle"]["pos"] for s in samples_bat])
 
-            # add velocity to Frames
-            PitchFrames._calculate_velocity(head_frames)
-            PitchFrames._calculate_velocity(handle_frames)
+            # add velocity to Tracks: average over a centred window of 5 frames, undefined near the ends
+            with instrument.stage("velocity"):
+                kinematics.track_kinematics([head_frames, handle_frames], acceleration=False,
+                                            method="centred", half_window=2, edge="nan")
 
         # get time of contact
-        temp = [s["time"] for s in samples_bat if ("event", "Hit") in s.items()]
+        temp = [s["time"] for s in samples_bat or [] if ("event", "Hit") in s.items()]
         try:
             hit_time = temp[0]
         except IndexError:
@@ -172,22 +312,3 @@ class PitchFrames:
             hit_time = None
 
         return PitchFrames(ball_frames, head_frames, handle_frames, hit_time)
-
-    @staticmethod
-    def _calculate_velocity(frames):
-        """
-        adds velocity information (speed and components) to a list of Frames
-        velocity is taken as average over a centred window of 10 frames.
-        does not update frames too close to list boundaries
-
-        updates frame object in place.
-        :param frames: list of Frame objects
-        :returns: None.
-        """
-        for start, mid, end in zip(frames[:-4], frames[2:-2], frames[4:]):
-            # mid takes average velocity over window [start, end]
-            delta_time = end.time - start.time
-            mid.vx = (end.x-start.x)/delta_time
-            mid.vy = (end.y-start.y)/delta_time
-            mid.vz = (end.z-start.z)/delta_time
-            mid.speed = np.sqrt(mid.vx**2 + mid.vy**2 + mid.vz**2)
@@ -0,0 +1,154 @@
+"""
+Grid-interpolated xxBA model: a fast, small stand-in for the pickled KNeighborsRegressor from KNN xBA.ipynb.
+
+The KNN is evaluated once on a dense exit velocity x launch angle grid. Predictions are then bilinear interpolation
+between the four surrounding grid points, which is vectorized and needs no training data. Inputs outside the grid
+are clamped to its edge.
+
+Usage:
+    python xxba.py build xxba.pickle xxba_grid.npz
+    python xxba.py compare xxba.pickle xxba_grid.npz data/mlb-all-swings-no-bunts.csv
+"""
+
+import argparse
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+FEATURES = ["exit_velocity", "launch_angle"]
+GRID_PATH = "xxba_grid.npz"
+PICKLE_PATH = "xxba.pickle"
+
+
+class GridModel:
+    """ xxBA surface sampled on a regular grid. predict() matches the KNN's predict() """
+
+    def __init__(self, exit_velocity, launch_angle, values):
+        """
+        :param exit_velocity: (m,) evenly spaced, increasing grid of exit velocities (mph)
+        :param launch_angle: (n,) evenly spaced, increasing grid of launch angles (degrees)
+        :param values: (m, n) xxBA at each grid point
+        """
+        self.exit_velocity = np.asarray(exit_velocity, dtype=float)
+        self.launch_angle = np.asarray(launch_angle, dtype=float)
+        self.values = np.asarray(values, dtype=np.float32)
+
+    @staticmethod
+    def from_model(model, ev_range=(0., 125.), la_range=(-90., 90.), step=0.5):
+        """
+        Sample a fitted model (anything with .predict on FEATURES columns) on a grid.
+        :param ev_range: (min, max) exit velocity of the grid
+        :param la_range: (min, max) launch angle of the grid
+        :param step: grid spacing, in mph and degrees
+        """
+        ev = np.arange(ev_range[0], ev_range[1] + step / 2, step)
+        la = np.arange(la_range[0], la_range[1] + step / 2, step)
+        ev_mesh, la_mesh = np.meshgrid(ev, la, indexing="ij")
+        points = pd.DataFrame({"exit_velocity": ev_mesh.ravel(), "launch_angle": la_mesh.ravel()})
+        values = np.asarray(model.predict(points), dtype=float).reshape(ev.size, la.size)
+        return GridModel(ev, la, values)
+
+    @staticmethod
+    def _position(grid, x):
+        """ :return: index of the grid cell containing x, and x's fractional position within it """
+        scaled = (x - grid[0]) / (grid[1] - grid[0])
+        i = np.clip(np.floor(scaled), 0, grid.size - 2).astype(np.int64)
+        return i, np.clip(scaled - i, 0, 1)
+
+    def predict(self, X):
+        """
+        :param X: DataFrame with FEATURES columns, or (N, 2) array of [exit velocity, launch angle]
+        :return: (N,) xxBA. NaN where either input is NaN
+        """
+        X = X[FEATURES].to_numpy(dtype=float) if isinstance(X, pd.DataFrame) else np.asarray(X, dtype=float)
+        ev, la = X[:, 0], X[:, 1]
+        missing = np.isnan(ev) | np.isnan(la)
+        i, u = self._position(self.exit_velocity, np.where(missing, self.exit_velocity[0], ev))
+        j, v = self._position(self.launch_angle, np.where(missing, self.launch_angle[0], la))
+        grid = self.values
+        out = ((1 - u) * (1 - v) * grid[i, j] + u * (1 - v) * grid[i + 1, j]
+               + (1 - u) * v * grid[i, j + 1] + u * v * grid[i + 1, j + 1])
+        out[missing] = np.nan
+        return out
+
+    def save(self, path=GRID_PATH):
+        np.savez_compressed(path, exit_velocity=self.exit_velocity, launch_angle=self.launch_angle,
+                            values=self.values)
+
+    @staticmethod
+    def load(path=GRID_PATH):
+        with np.load(path) as f:
+            return GridModel(f["exit_velocity"], f["launch_angle"], f["values"])
+
+
+def load(path):
+    """ load an xxBA model: a GridModel from .npz, otherwise a pickled model """
+    if str(path).endswith(".npz"):
+        return GridModel.load(path)
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def compare(reference, grid, X, label=None):
+    """
+    Accuracy of the grid model against the model it was sampled from.
+    :param reference: original (KNN) model
+    :param grid: GridModel
+    :param X: inputs to compare on, DataFrame with FEATURES columns
+    :param label: optional boolean array, True where the batted ball was a hit. Adds ROC AUC of both models,
+        the same check as the RocCurveDisplay plots in KNN xBA.ipynb
+    :return: dict of max/mean absolute error, and AUCs if label was given
+    """
+    expected = np.asarray(reference.predict(X), dtype=float).squeeze()
+    predicted = grid.predict(X)
+    error = np.abs(predicted - expected)
+    result = {"max_abs_error": float(np.nanmax(error)), "mean_abs_error": float(np.nanmean(error))}
+    if label is not None:
+        from sklearn.metrics import roc_auc_score
+        label = np.asarray(label, dtype=bool)
+        result["auc_reference"] = float(roc_auc_score(label, expected))
+        result["auc_grid"] = float(roc_auc_score(label, predicted))
+    return result
+
+
+def throughput(model, X, repeats=3):
+    """ :return: best rows per second of model.predict(X) over a few repeats """
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(X)
+        best = min(best, time.perf_counter() - start)
+    return len(X) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="sample a pickled model onto a grid")
+    build.add_argument("pickle_path", nargs="?", default=PICKLE_PATH)
+    build.add_argument("grid_path", nargs="?", default=GRID_PATH)
+    build.add_argument("--step", type=float, default=0.5, help="grid spacing, in mph and degrees")
+    check = commands.add_parser("compare", help="compare accuracy and speed of the grid against the pickled model")
+    check.add_argument("pickle_path")
+    check.add_argument("grid_path")
+    check.add_argument("swings_csv", help="statcast swings, eg. data/mlb-all-swings-no-bunts.csv")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        GridModel.from_model(load(args.pickle_path), step=args.step).save(args.grid_path)
+        return
+
+    reference, grid = load(args.pickle_path), GridModel.load(args.grid_path)
+    swings = pd.read_csv(args.swings_csv, usecols=["launch_speed", "launch_angle", "events"])
+    swings = swings.rename(columns={"launch_speed": "exit_velocity"}).dropna(subset=FEATURES)
+    label = swings.events.isin(["single", "double", "triple", "home_run"])
+    for key, value in compare(reference, grid, swings[FEATURES], label).items():
+        print(f"{key:>16}: {value:.4f}")
+    for name, model in [("reference", reference), ("grid", grid)]:
+        print(f"{name:>16}: {throughput(model, swings[FEATURES]):,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()